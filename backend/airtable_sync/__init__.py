@@ -0,0 +1,25 @@
+"""Airtable -> MySQL sync of viajes registered by the PWA.
+
+Library entry points::
+
+    from airtable_sync import SyncConfig, SyncEngine
+
+    with SyncEngine(SyncConfig.from_env()) as engine:
+        metrics = engine.run(confirm=True, incremental=True)
+
+sync_airtable_to_mysql.py is the command line wrapper around SyncEngine.
+"""
+from .airtable import AirtableClient
+from .config import ConfigError, SyncConfig
+from .daemon import AdaptivePoller, run_daemon
+from .csv_import import import_csv
+from .db import MySQLPool
+from .engine import SyncEngine
+from .ledger import SyncLedger
+from .metrics import SyncMetrics
+from .sources import MultiSourceSync, load_sources
+
+__all__ = [
+    'AdaptivePoller', 'AirtableClient', 'ConfigError', 'MultiSourceSync', 'MySQLPool', 'SyncConfig', 'SyncEngine',
+    'SyncLedger', 'SyncMetrics', 'import_csv', 'load_sources', 'run_daemon',
+]
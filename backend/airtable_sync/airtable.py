@@ -0,0 +1,284 @@
+"""Airtable API client and list-records query parameters."""
+import threading
+import time
+
+import requests
+import requests.adapters
+
+from .metrics import SyncMetrics
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to stay under Airtable's rate limit.
+
+    Airtable allows 5 requests per second per base; every request made by the
+    sync (page fetches and deletes) takes one token first.
+    """
+
+    def __init__(self, rate=5.0, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the seconds slept."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _retry_wait(resp, attempt):
+    # If Airtable provides Retry-After, respect it
+    retry_after = resp.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return int(retry_after)
+        except ValueError:
+            pass
+    return min(2 ** attempt, 60)
+
+
+AIRTABLE_DELETE_BATCH = 10
+
+
+class AirtableClient:
+    """Airtable API client sharing one pooled, keep-alive requests.Session.
+
+    Every call (page fetches, deletes and any future writes) goes through the
+    same session so TCP/TLS connections to api.airtable.com are reused instead
+    of being re-established per request, which dominates wall-clock time on
+    high-latency links. Requests are paced by a token bucket and retried on
+    network errors, 429 and 5xx. Requests, retries and sleeps are counted in
+    `metrics`, and page fetches and deletes timed as the fetch/delete stages.
+    """
+
+    def __init__(self, url, headers, rate_limit=5.0, pool_size=4, connect_timeout=10, read_timeout=30, max_retries=5,
+                 metrics=None, limiter=None):
+        self.url = url
+        self.metrics = metrics if metrics is not None else SyncMetrics()
+        self.max_retries = max_retries
+        self.timeout = (connect_timeout, read_timeout)
+        # A limiter may be shared by the clients of several tables in the same base
+        self.limiter = limiter or (TokenBucket(rate=rate_limit) if rate_limit else None)
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        # Retries are handled in request(), keep urllib3's own retries off
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_config(cls, config, metrics=None, limiter=None):
+        return cls(
+            config.airtable_url,
+            config.headers,
+            metrics=metrics,
+            limiter=limiter,
+            rate_limit=config.rate_limit,
+            pool_size=config.pool_size,
+            connect_timeout=config.connect_timeout,
+            read_timeout=config.read_timeout,
+        )
+
+    def close(self):
+        self.session.close()
+
+    def request(self, method, params=None, path=''):
+        """Send one Airtable request, paced by the limiter, retrying network errors, 429 and 5xx.
+
+        Returns the final response (which may still be an error status the caller
+        has to interpret). Raises RuntimeError once the retries are exhausted.
+        """
+        url = f"{self.url}/{path}" if path else self.url
+        metrics = self.metrics
+        max_retries = self.max_retries
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                waited = self.limiter.acquire()
+                if waited:
+                    metrics.incr('rate_limit_sleep_seconds', waited)
+            metrics.incr('http_requests', label=method)
+            try:
+                resp = self.session.request(method, url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                metrics.incr('http_responses', label='network_error')
+                attempt += 1
+                if attempt > max_retries:
+                    raise RuntimeError(f"Network error while contacting Airtable after {max_retries} attempts: {e}")
+                sleep = min(2 ** attempt, 60)
+                metrics.incr('http_retries')
+                metrics.incr('retry_sleep_seconds', float(sleep))
+                time.sleep(sleep)
+                continue
+            metrics.incr('http_responses', label=str(resp.status_code))
+
+            # Handle rate limits and server errors with retry/backoff
+            if resp.status_code == 429 or 500 <= resp.status_code < 600:
+                attempt += 1
+                if attempt > max_retries:
+                    raise RuntimeError(f"Airtable returned status {resp.status_code} after {max_retries} retries")
+                sleep = _retry_wait(resp, attempt)
+                metrics.incr('http_retries')
+                metrics.incr('retry_sleep_seconds', float(sleep))
+                time.sleep(sleep)
+                continue
+
+            return resp
+
+    def iter_pages(self, params=None):
+        """Yield Airtable records page by page (up to 100 records per page).
+
+        Each page is yielded as soon as it arrives so callers can start writing
+        before the rest of the table has been downloaded; memory stays bounded by
+        the page size. `params` (e.g. filterByFormula) are sent with every page
+        request. Raises RuntimeError on unrecoverable errors.
+        """
+        base_params = dict(params or {})
+        offset = None
+
+        while True:
+            params = dict(base_params)
+            if offset:
+                params['offset'] = offset
+
+            with self.metrics.stage('fetch'):
+                resp = self.request('GET', params=params)
+
+                # Parse JSON
+                try:
+                    data = resp.json()
+                except ValueError:
+                    raise RuntimeError(f"Airtable returned non-JSON response (status {resp.status_code}): {resp.text}")
+
+            # If Airtable returns an error shape like {'error': 'NOT_FOUND'} or {'error': {...}}
+            if isinstance(data, dict) and "error" in data:
+                err = data.get("error")
+                if isinstance(err, dict):
+                    msg = err.get("message") or err.get("type") or str(err)
+                else:
+                    msg = str(err)
+                if resp.status_code == 404:
+                    raise RuntimeError(
+                        f"Airtable API 404 Not Found. Check AIRTABLE_BASE_ID and AIRTABLE_TABLE_NAME. "
+                        f"Resolved URL: {self.url} (ensure table name is correct and URL-encoded)."
+                    )
+                raise RuntimeError(f"Airtable API error (status {resp.status_code}): {msg}")
+
+            # Successful response should include 'records'
+            if not isinstance(data, dict) or "records" not in data:
+                raise RuntimeError(f"Unexpected Airtable response shape (status {resp.status_code}): {data}")
+
+            offset = data.get('offset')
+            yield data.get('records', [])
+
+            if not offset:
+                break
+
+    def fetch_all(self, params=None):
+        """Fetch all records into a single list (the sync itself streams pages)."""
+        all_records = []
+        for page in self.iter_pages(params):
+            all_records.extend(page)
+        return all_records
+
+    def delete_records(self, record_ids):
+        """Delete records from Airtable, 10 ids per request (the API maximum).
+
+        Returns {record_id: True/False} with the outcome of each id and prints
+        one line per id.
+        """
+        with self.metrics.stage('delete'):
+            results = self._delete_records(record_ids)
+        self.metrics.incr('records_deleted', sum(1 for ok in results.values() if ok))
+        return results
+
+    def _delete_records(self, record_ids):
+        results = {}
+        for start in range(0, len(record_ids), AIRTABLE_DELETE_BATCH):
+            chunk = list(record_ids[start:start + AIRTABLE_DELETE_BATCH])
+            try:
+                resp = self.request('DELETE', params={'records[]': chunk})
+            except RuntimeError as e:
+                for record_id in chunk:
+                    print({"warning": "failed_to_delete_airtable_record_network", "record_id": record_id, "error": str(e)})
+                    results[record_id] = False
+                continue
+
+            # Try to include JSON error body if present
+            try:
+                body = resp.json()
+            except Exception:
+                body = resp.text
+
+            if resp.status_code not in (200, 202, 204):
+                for record_id in chunk:
+                    msg = {"error": "airtable_delete_failed", "record_id": record_id, "status": resp.status_code, "body": body}
+                    # Add hint for auth/permissions
+                    if resp.status_code in (401, 403):
+                        msg['hint'] = 'Check AIRTABLE_TOKEN permissions (needs data.records:delete) and that the token has access to the base.'
+                    print(msg)
+                    results[record_id] = False
+                continue
+
+            deleted = set()
+            if isinstance(body, dict):
+                deleted = {r.get('id') for r in body.get('records', []) if r.get('deleted')}
+            for record_id in chunk:
+                ok = record_id in deleted
+                if ok:
+                    print({"info": "airtable_record_deleted", "record_id": record_id, "status": resp.status_code})
+                else:
+                    print({"error": "airtable_delete_failed", "record_id": record_id, "status": resp.status_code, "body": body})
+                results[record_id] = ok
+        return results
+
+
+# Airtable fields read by the transform, as posted by the PWA (PendingList.vue).
+# Only these are requested by default so long text, attachment or lookup
+# columns added to the base later do not inflate every page. Airtable rejects
+# unknown names, so extra columns are opt-in through --fields/AIRTABLE_FIELDS.
+AIRTABLE_SYNC_FIELDS = [
+    'Fecha', 'Chofer', 'Patente', 'Origen', 'Destino', 'Observaciones', 'Sin_Actividad',
+    'Motivo_Sin_Actividad', 'Producto', 'TNPulpable', 'TNAserrable', 'TNChips',
+]
+
+
+def build_fetch_params(config, watermark=None):
+    """Build the list-records query params (fields[], pageSize, view, filterByFormula)."""
+    params = {}
+    if not config.all_fields:
+        if config.fields:
+            fields = [f.strip() for f in config.fields.split(',') if f.strip()]
+        else:
+            fields = list(AIRTABLE_SYNC_FIELDS)
+        if watermark is not None and watermark.field and watermark.field not in fields:
+            fields.append(watermark.field)
+        params['fields[]'] = fields
+    if config.page_size:
+        params['pageSize'] = max(1, min(100, config.page_size))
+    if config.view:
+        params['view'] = config.view
+
+    formulas = []
+    if watermark is not None and watermark.formula():
+        formulas.append(watermark.formula())
+    if config.filter_formula:
+        formulas.append(config.filter_formula)
+    if len(formulas) == 1:
+        params['filterByFormula'] = formulas[0]
+    elif formulas:
+        params['filterByFormula'] = f"AND({', '.join(formulas)})"
+    return params
@@ -0,0 +1,71 @@
+"""Content-hash change detection: skip re-seen records whose values did not change."""
+import hashlib
+import json
+
+from .db import ensure_table
+
+# NormalizedViaje attributes that end up in moviles_viajes (directly or through a dimension id)
+HASHED_FIELDS = (
+    'fecha', 'origen_value', 'destino', 'producto', 'tn_pulpable', 'tn_aserrable', 'tn_chip',
+    'sin_actividad', 'motivo', 'observaciones', 'cuit', 'chofer_name', 'patente',
+)
+
+
+def row_digest(row, empresa_id=None, area_id=None):
+    """Stable hash of a NormalizedViaje's values (and the ids the run writes with it)."""
+    values = [getattr(row, name) for name in HASHED_FIELDS]
+    values.extend((empresa_id, area_id))
+    payload = json.dumps(values, default=str, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RowHashes:
+    """Last written hash per record_id, in a small MySQL table next to moviles_viajes.
+
+    Before a page is resolved, the stored hashes of its records are read with
+    one IN (...) query; records whose hash matches are reported as stored
+    without being resolved or written again. The hashes of written rows are
+    upserted in the same transaction as the rows themselves, so they never
+    claim a write that was rolled back. With `skip_unchanged` False every
+    record is written and its hash refreshed (--force-write).
+    """
+
+    table = 'airtable_sync_hashes'
+
+    def __init__(self, empresa_id=None, area_id=None, skip_unchanged=True):
+        self.empresa_id = empresa_id
+        self.area_id = area_id
+        self.skip_unchanged = skip_unchanged
+
+    def ensure_table(self, mysql_conn, cursor):
+        ensure_table(mysql_conn, cursor, self.table, "record_id VARCHAR(64) NOT NULL PRIMARY KEY, hash CHAR(32) NOT NULL")
+        return self
+
+    def split(self, cursor, rows):
+        """Return (changed rows, unchanged record ids, {record_id: digest} of the changed rows)."""
+        digests = {row.record_id: row_digest(row, self.empresa_id, self.area_id) for row in rows}
+        if not self.skip_unchanged:
+            return rows, [], digests
+        stored = {}
+        ids = list(digests)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join(['%s'] * len(chunk))
+            cursor.execute(f"SELECT record_id, hash FROM {self.table} WHERE record_id IN ({placeholders})", tuple(chunk))
+            stored.update(cursor.fetchall())
+        unchanged = [rid for rid, digest in digests.items() if stored.get(rid) == digest]
+        if not unchanged:
+            return rows, [], digests
+        skip = set(unchanged)
+        changed = [row for row in rows if row.record_id not in skip]
+        return changed, unchanged, {rid: d for rid, d in digests.items() if rid not in skip}
+
+    def save(self, cursor, digests, record_ids):
+        """Store the digests of `record_ids` (the rows just written)."""
+        params = [(rid, digests[rid]) for rid in record_ids if rid in digests]
+        if params:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (record_id, hash) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE hash = VALUES(hash)",
+                params,
+            )
@@ -0,0 +1,201 @@
+"""Configuration for the Airtable -> MySQL sync.
+
+Nothing is read at import time: SyncConfig.from_env() loads .env and the
+environment when it is called, and validate() reports missing settings with a
+ConfigError instead of exiting, so the sync can be embedded in a worker,
+a scheduler or tests.
+"""
+import dataclasses
+import os
+import urllib.parse
+
+DEFAULT_AIRTABLE_API_URL = 'https://api.airtable.com/v0'
+
+# The PWA's chofer list, used to find the CUIT of choferes reported only by name
+DEFAULT_CHOFERES_CATALOG = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pwa-app', 'public', 'data', 'choferes.json'
+))
+
+_TRUE = ('1', 'true', 'yes')
+
+
+class ConfigError(ValueError):
+    """Raised when required settings are missing or invalid."""
+
+
+@dataclasses.dataclass
+class SyncConfig:
+    """Connection settings and run options for one SyncEngine.
+
+    The run options mirror the command line flags of sync_airtable_to_mysql.py
+    (same attribute names), so they can be overridden per run with
+    SyncEngine.run(**options).
+    """
+
+    # Airtable
+    airtable_token: str = None
+    base_id: str = None
+    table_name: str = None
+    api_url: str = DEFAULT_AIRTABLE_API_URL
+    rate_limit: float = 5.0
+    pool_size: int = 4
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+
+    # MySQL
+    mysql_host: str = None
+    mysql_user: str = None
+    mysql_password: str = None
+    mysql_database: str = None
+    # Connections kept by the engine's pool (raise it for parallel engines sharing one pool)
+    mysql_pool_size: int = 1
+    mysql_connect_timeout: int = 10
+    # Attempts for a batch that fails with a transient error (lost connection, deadlock)
+    mysql_retries: int = 3
+    mysql_retry_delay: float = 1.0
+    # Allow LOAD DATA LOCAL INFILE on the pooled connections (import-csv)
+    mysql_local_infile: bool = False
+
+    # Business settings
+    empresa_id: str = None
+    area_id: str = None
+    allow_placeholder_movil: bool = False
+    placeholder_prefix: str = 'UNKNOWN'
+    # Seconds a loaded dimension cache is reused by later runs of the same engine
+    dimension_cache_ttl: float = 300.0
+    # choferes.json-style file ([{"nombre", "dni"}]) mapping chofer names to CUITs
+    choferes_catalog: str = None
+
+    # Run options (command line flags)
+    dry_run: bool = False
+    limit: int = 0
+    confirm: bool = False
+    mysql: bool = False
+    use_async: bool = False
+    incremental: bool = False
+    watermark_field: str = None
+    page_size: int = 100
+    view: str = None
+    filter_formula: str = None
+    fields: str = None
+    all_fields: bool = False
+    commit_size: int = 0
+    workers: int = 0
+    snapshot_out: str = None
+    from_snapshot: str = None
+    batch_size: int = 100
+    # Rewrite every record even when its content hash is unchanged (refreshes the stored hashes)
+    force_write: bool = False
+    # Local SQLite file tracking each record from fetched to deleted (--confirm runs only)
+    ledger: str = None
+
+    @classmethod
+    def from_env(cls, env=None, dotenv=True, **overrides):
+        """Build a config from the environment (and .env unless `dotenv` is False)."""
+        if env is None:
+            if dotenv:
+                from dotenv import load_dotenv
+                load_dotenv()
+            env = os.environ
+        config = cls(
+            # Prefer AIRTABLE_TOKEN (newer PAT style). Fall back to AIRTABLE_API_KEY
+            airtable_token=env.get('AIRTABLE_TOKEN') or env.get('AIRTABLE_API_KEY'),
+            base_id=env.get('AIRTABLE_BASE_ID'),
+            table_name=env.get('AIRTABLE_TABLE_NAME'),
+            api_url=env.get('AIRTABLE_API_URL', DEFAULT_AIRTABLE_API_URL),
+            rate_limit=float(env.get('AIRTABLE_RATE_LIMIT', '5')),
+            pool_size=int(env.get('AIRTABLE_POOL_SIZE', '4')),
+            connect_timeout=float(env.get('AIRTABLE_CONNECT_TIMEOUT', '10')),
+            read_timeout=float(env.get('AIRTABLE_READ_TIMEOUT', '30')),
+            mysql_host=env.get('MYSQL_HOST'),
+            mysql_user=env.get('MYSQL_USER'),
+            mysql_password=env.get('MYSQL_PASSWORD'),
+            mysql_database=env.get('MYSQL_DATABASE'),
+            mysql_pool_size=int(env.get('MYSQL_POOL_SIZE', '1')),
+            mysql_connect_timeout=int(env.get('MYSQL_CONNECT_TIMEOUT', '10')),
+            mysql_retries=int(env.get('MYSQL_RETRIES', '3')),
+            mysql_retry_delay=float(env.get('MYSQL_RETRY_DELAY', '1')),
+            mysql_local_infile=env.get('MYSQL_LOCAL_INFILE', 'false').lower() in _TRUE,
+            # Resolve empresa and area from environment (support multiple env var names)
+            empresa_id=env.get('MOVILES_EMPRESA_ID') or env.get('EMPRESA_ID') or env.get('COMPANY_ID') or None,
+            area_id=env.get('MOVILES_AREA_ID') or env.get('AREA_ID') or None,
+            # Allow creating placeholder movils when patente is missing (set to 'true' to enable)
+            allow_placeholder_movil=env.get('ALLOW_PLACEHOLDER_MOVIL', 'false').lower() in _TRUE,
+            placeholder_prefix=env.get('PLACEHOLDER_MOVIL_PREFIX', 'UNKNOWN'),
+            dimension_cache_ttl=float(env.get('SYNC_DIMENSION_CACHE_TTL', '300')),
+            choferes_catalog=env.get('CHOFERES_CATALOG') or (
+                DEFAULT_CHOFERES_CATALOG if os.path.exists(DEFAULT_CHOFERES_CATALOG) else None
+            ),
+            fields=env.get('AIRTABLE_FIELDS'),
+        )
+        return config.replace(**overrides) if overrides else config
+
+    def replace(self, **changes):
+        """Copy of this config with `changes` applied (unknown names raise TypeError)."""
+        return dataclasses.replace(self, **changes)
+
+    @classmethod
+    def option_names(cls):
+        return [f.name for f in dataclasses.fields(cls)]
+
+    def missing(self):
+        """Names of the required environment variables that are not set."""
+        missing = []
+        # A --from-snapshot replay never calls Airtable, not even to delete with --confirm
+        if self.from_snapshot:
+            return missing
+        # Require either AIRTABLE_TOKEN (preferred) or AIRTABLE_API_KEY (fallback)
+        if not self.airtable_token:
+            missing.append('AIRTABLE_TOKEN or AIRTABLE_API_KEY')
+        if not self.base_id:
+            missing.append('AIRTABLE_BASE_ID')
+        if not self.table_name:
+            missing.append('AIRTABLE_TABLE_NAME')
+        return missing
+
+    def validate(self):
+        """Fail fast with an actionable message instead of a 404 from the Airtable API."""
+        missing = self.missing()
+        if missing:
+            raise ConfigError(f"Missing environment variables: {', '.join(missing)}")
+        return self
+
+    @property
+    def writes(self):
+        """True when the run writes to MySQL (--mysql or --confirm)."""
+        return bool(self.confirm or self.mysql)
+
+    @property
+    def deletes(self):
+        """True when the run deletes the stored records from Airtable (--confirm).
+
+        A snapshot replay never touches Airtable, so there is nothing to delete there.
+        """
+        return bool(self.confirm and not self.from_snapshot)
+
+    @property
+    def airtable_url(self):
+        # URL-encode the table name in case it contains spaces or special chars.
+        encoded_table = urllib.parse.quote(self.table_name or '', safe='')
+        return f"{self.api_url.rstrip('/')}/{self.base_id}/{encoded_table}"
+
+    @property
+    def headers(self):
+        if not self.airtable_token:
+            return None
+        return {
+            "Authorization": f"Bearer {self.airtable_token}",
+            "Content-Type": "application/json",
+        }
+
+    @property
+    def watermark_source(self):
+        return f"{self.base_id}/{self.table_name}"
+
+    def mysql_params(self):
+        return {
+            'host': self.mysql_host,
+            'user': self.mysql_user,
+            'password': self.mysql_password,
+            'database': self.mysql_database,
+        }
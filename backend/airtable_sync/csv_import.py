@@ -0,0 +1,318 @@
+"""Bulk load of an Airtable CSV export into moviles_viajes (sync_airtable_to_mysql.py import-csv).
+
+The CSV is streamed in chunks of records shaped like the API's
+({"id", "createdTime", "fields"}), so every row goes through the same
+FieldPlan normalization and dimension resolution as a sync run. Instead of
+one upsert per batch, each chunk is loaded into a temporary staging table
+(LOAD DATA LOCAL INFILE from a temporary TSV file, or multi-row executemany
+chunks when the client or server does not allow LOCAL INFILE) and merged
+into moviles_viajes with a few set-based statements keyed on record_id.
+Each chunk is one transaction, content hashes are kept as in a sync run,
+and nothing is deleted in Airtable, so an interrupted import can simply be
+run again.
+"""
+import csv
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from functools import partial
+
+from .changes import RowHashes
+from .db import is_transient
+from .engine import prefetch, resolve_dimensions, rollback
+from .metrics import CountingCursor, SyncMetrics
+from .normalize import FieldPlan, iter_normalized
+from .viajes import ViajesSchema
+
+# Header names Airtable exports use for the record id column (a formula field RECORD_ID())
+ID_COLUMNS = ('Record ID', 'record_id', 'RECORD_ID', 'RecordId', 'recordId', 'id', 'ID')
+
+STAGING_TABLE = 'airtable_import_staging'
+
+# Rows per INSERT statement when the staging table is loaded without LOAD DATA
+INSERT_CHUNK = 1000
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def csv_record(row, id_column=None):
+    """Airtable-like record for one CSV row; empty cells are dropped as the API does."""
+    fields = {}
+    for key, value in row.items():
+        if key is None or value is None:
+            # Extra cells without a header
+            continue
+        value = value.strip()
+        if value:
+            fields[key.strip()] = value
+    record_id = (row.get(id_column) or '').strip() if id_column else ''
+    if not record_id:
+        # Without a record id column the id is derived from the row, so re-importing the same file is idempotent
+        payload = json.dumps(sorted(fields.items()), ensure_ascii=False, separators=(',', ':'))
+        record_id = 'csv' + hashlib.blake2b(payload.encode('utf-8'), digest_size=7).hexdigest()
+    return {'id': record_id, 'createdTime': None, 'fields': fields}
+
+
+def iter_csv_pages(path, page_size=5000, id_column=None, delimiter=',', encoding='utf-8-sig'):
+    """Yield lists of up to `page_size` records read from the CSV at `path`."""
+    with open(path, newline='', encoding=encoding) as fh:
+        reader = csv.DictReader(fh, delimiter=delimiter)
+        header = [name.strip() for name in reader.fieldnames or []]
+        reader.fieldnames = header
+        if id_column and id_column not in header:
+            raise ValueError(f"CSV column {id_column!r} not found (columns: {', '.join(header)})")
+        id_column = id_column or next((name for name in ID_COLUMNS if name in header), None)
+        if id_column is None:
+            print({"warning": "csv_without_record_id", "path": path,
+                   "hint": "ids are derived from the row contents; edited rows are imported as new viajes"})
+        page = []
+        for row in reader:
+            page.append(csv_record(row, id_column))
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+
+def _tsv_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value).translate(_TSV_ESCAPES)
+
+
+class CsvImporter:
+    """Stage-and-merge writer for the rows of one CSV import.
+
+    The staging table is a session TEMPORARY table with moviles_viajes' own
+    column types, plus a `_variant` number naming the column set of each row
+    (build_row leaves origen and chofer out when they are unknown, so the
+    stored value is kept on update and the default applies on insert). The
+    merge runs once per variant: INSERT ... SELECT ... ON DUPLICATE KEY UPDATE
+    when record_id is unique, otherwise an UPDATE ... JOIN followed by an
+    INSERT of the record ids that are not stored yet.
+    """
+
+    def __init__(self, engine, config, metrics, load_data=True):
+        self.engine = engine
+        self.config = config
+        self.metrics = metrics
+        self.load_data = load_data
+        self.empresa_id = config.empresa_id
+        self.area_id = config.area_id
+        self.placeholder_prefix = config.placeholder_prefix if config.allow_placeholder_movil else None
+        self.conn = engine.mysql_conn
+        self.cursor = CountingCursor(self.conn.cursor(), metrics)
+        if engine.schema is None:
+            engine.schema = ViajesSchema.load(self.cursor)
+        self.schema = engine.schema
+        if not self.schema.has_record_id:
+            raise RuntimeError('import-csv needs a record_id column in moviles_viajes to merge on')
+        if not engine.hashes_ready:
+            RowHashes().ensure_table(self.conn, self.cursor)
+            engine.hashes_ready = True
+        self.hashes = RowHashes(self.empresa_id, self.area_id, skip_unchanged=not config.force_write)
+        self.columns = [col for col, _ in self.schema.plan]
+        self.variants = {}
+        self._merge_sql = {}
+        self._create_staging()
+
+    def _create_staging(self):
+        cursor = self.cursor
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+        # Same column types as the target, without its rows, keys or defaults
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {STAGING_TABLE} AS "
+            f"SELECT {','.join(self.columns)} FROM {self.schema.table} WHERE 1 = 0"
+        )
+        cursor.execute(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN _variant SMALLINT NOT NULL DEFAULT 0")
+        cursor.execute(f"CREATE INDEX {STAGING_TABLE}_record_id ON {STAGING_TABLE} (record_id)")
+        self.conn.commit()
+
+    def close(self):
+        try:
+            self.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+        except Exception:
+            pass
+        try:
+            self.cursor.close()
+        except Exception:
+            pass
+
+    def staging_row(self, viaje):
+        """Staging values for `viaje`: all plan columns, then its variant number."""
+        cols, vals = self.schema.build_row(viaje)
+        variant = self.variants.setdefault(cols, len(self.variants))
+        values = dict(zip(cols, vals))
+        # Columns left out of this variant are never read by its merge; 0 fits their integer id type
+        return [values.get(col, 0) for col in self.columns] + [variant]
+
+    def write(self, rows):
+        """Stage, merge and commit one chunk of normalized rows; returns the record ids stored."""
+        # The last occurrence of a record id in the file wins
+        rows = list({row.record_id: row for row in rows}.values())
+        return self._write(rows)
+
+    def _write(self, rows):
+        metrics = self.metrics
+        try:
+            with metrics.stage('resolve'):
+                rows, unchanged, digests = self.hashes.split(self.cursor, rows)
+                viajes, skipped = resolve_dimensions(self.conn, self.cursor, self.engine.dimensions, rows,
+                                                     self.empresa_id, self.area_id, self.placeholder_prefix)
+            with metrics.stage('write'):
+                staged = [self.staging_row(viaje) for viaje in viajes]
+                if staged:
+                    self.cursor.execute(f"DELETE FROM {STAGING_TABLE}")
+                    self._load(staged)
+                    self._merge({row[-1] for row in staged})
+                written = [viaje['record_id'] for viaje in viajes]
+                self.hashes.save(self.cursor, digests, written)
+            with metrics.stage('commit'):
+                self.conn.commit()
+        except Exception:
+            rollback(self.conn)
+            metrics.incr('batches_rolled_back')
+            raise
+        metrics.incr('records_written', len(written))
+        metrics.incr('records_unchanged', len(unchanged))
+        metrics.incr('records_skipped', skipped)
+        return unchanged + written
+
+    def _load(self, staged):
+        if not staged:
+            return
+        if self.load_data:
+            try:
+                warnings = self._load_data(staged)
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                # LOCAL INFILE disabled on the client or the server: insert in chunks from now on
+                print({"warning": "load_data_unavailable", "error": str(e), "fallback": "executemany"})
+                self.load_data = False
+            else:
+                if not warnings:
+                    self.metrics.incr('staging_rows_loaded', len(staged), label='load_data')
+                    return
+                # LOAD DATA truncates or converts bad values where INSERT fails: reload this chunk with INSERT
+                print({"warning": "load_data_warnings", "count": len(warnings), "warnings": warnings[:5],
+                       "fallback": "executemany"})
+                self.metrics.incr('load_data_rejected_chunks')
+                self.cursor.execute(f"DELETE FROM {STAGING_TABLE}")
+        sql = (
+            f"INSERT INTO {STAGING_TABLE} ({','.join(self.columns)},_variant) "
+            f"VALUES ({','.join(['%s'] * (len(self.columns) + 1))})"
+        )
+        for start in range(0, len(staged), INSERT_CHUNK):
+            self.cursor.executemany(sql, [tuple(row) for row in staged[start:start + INSERT_CHUNK]])
+        self.metrics.incr('staging_rows_loaded', len(staged), label='executemany')
+
+    def _load_data(self, staged):
+        fd, path = tempfile.mkstemp(prefix='airtable_import_', suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as fh:
+                for row in staged:
+                    fh.write('\t'.join(_tsv_value(value) for value in row))
+                    fh.write('\n')
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {STAGING_TABLE} CHARACTER SET utf8mb4 "
+                f"({','.join(self.columns)},_variant)",
+                (path,),
+            )
+        finally:
+            os.remove(path)
+        if not getattr(self.cursor, 'warning_count', 0):
+            return []
+        self.cursor.execute("SHOW WARNINGS")
+        return [f"{level} {code}: {message}" for level, code, message in self.cursor.fetchall() if level != 'Note']
+
+    def _merge(self, variants):
+        now = datetime.utcnow()
+        for cols, variant in self.variants.items():
+            if variant not in variants:
+                continue
+            for sql, stamps in self.merge_statements(cols):
+                self.cursor.execute(sql, (now,) * stamps + (variant,))
+
+    def merge_statements(self, cols):
+        """[(sql, stamps)] merging the staged rows of one column set.
+
+        Each statement takes `stamps` timestamp parameters followed by the variant number.
+        """
+        statements = self._merge_sql.get(cols)
+        if statements is not None:
+            return statements
+        schema = self.schema
+        target = schema.table
+        insert_cols = list(cols)
+        select_cols = [f"s.{col}" for col in cols]
+        if schema.has_created_at:
+            insert_cols.append('created_at')
+            select_cols.append('%s')
+        if schema.has_updated_at:
+            insert_cols.append('updated_at')
+            select_cols.append('%s')
+        stamps = len(insert_cols) - len(cols)
+        insert = (
+            f"INSERT INTO {target} ({','.join(insert_cols)}) "
+            f"SELECT {','.join(select_cols)} FROM {STAGING_TABLE} s WHERE s._variant = %s"
+        )
+        if schema.unique_record_id:
+            updates = [f"{col} = VALUES({col})" for col in cols if col != 'record_id']
+            if schema.has_updated_at:
+                updates.append('updated_at = VALUES(updated_at)')
+            statements = [(f"{insert} ON DUPLICATE KEY UPDATE {','.join(updates)}", stamps)]
+        else:
+            sets = [f"v.{col} = s.{col}" for col in cols if col != 'record_id']
+            if schema.has_updated_at:
+                sets.append('v.updated_at = %s')
+            statements = [
+                (f"UPDATE {target} v JOIN {STAGING_TABLE} s ON v.record_id = s.record_id "
+                 f"SET {','.join(sets)} WHERE s._variant = %s", int(schema.has_updated_at)),
+                (f"{insert} AND NOT EXISTS (SELECT 1 FROM {target} v WHERE v.record_id = s.record_id)", stamps),
+            ]
+        self._merge_sql[cols] = statements
+        return statements
+
+
+def import_csv(engine, path, metrics=None, page_size=5000, id_column=None, delimiter=',', encoding='utf-8-sig',
+               load_data=True):
+    """Import the Airtable CSV export at `path` through `engine`'s connection and caches.
+
+    Returns the run's SyncMetrics. Chunks already committed stay committed
+    when a later one fails; the error is printed and raised.
+    """
+    config = engine.config
+    metrics = metrics if metrics is not None else SyncMetrics()
+    importer = None
+    pages = None
+    read = 0
+    try:
+        importer = CsvImporter(engine, config, metrics, load_data=load_data)
+        pages = prefetch(iter_csv_pages(path, page_size=page_size, id_column=id_column, delimiter=delimiter,
+                                        encoding=encoding))
+        batches = iter_normalized(pages, FieldPlan(), workers=config.workers,
+                                  timer=partial(metrics.stage, 'transform'))
+        for page_index, (page, rows) in enumerate(batches):
+            read += len(page)
+            metrics.incr('records_fetched', len(page))
+            written = importer.write(rows)
+            print({"info": "csv_chunk_imported", "chunk": page_index, "count": len(page), "stored": len(written)})
+            if engine.stopping.is_set():
+                print({"info": "import_stopping", "after_chunk": page_index})
+                break
+    except Exception as e:
+        print({"error": "csv_import_failed", "path": path, "after_records": read, "exception": str(e)})
+        raise
+    finally:
+        if pages is not None:
+            pages.close()
+        if importer is not None:
+            importer.close()
+        print({"info": "csv_records_count", "count": read})
+    return metrics
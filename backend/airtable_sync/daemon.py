@@ -0,0 +1,99 @@
+"""Long-running sync (--daemon): repeated engine runs with an adaptive poll interval.
+
+The engine keeps its MySQL connection, HTTP session, schema and dimension
+cache between runs, so each poll only costs the Airtable list request (plus
+whatever arrived). The interval follows the recent arrival rate: it aims at
+`target` new records per poll, so it shortens while trucks are reporting and
+doubles on every idle poll up to `max_interval`.
+"""
+import signal
+import time
+
+from .metrics import SyncMetrics
+
+
+class AdaptivePoller:
+    """Poll interval driven by an exponentially weighted arrival rate."""
+
+    def __init__(self, min_interval=15.0, max_interval=600.0, target=10, alpha=0.5):
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.target = max(1, target)
+        self.alpha = alpha
+        self.rate = None
+        self.interval = self.min_interval
+
+    def _clamp(self, seconds):
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def observe(self, arrivals, window):
+        """Record `arrivals` new records over the last `window` seconds; return the next interval."""
+        if window > 0:
+            sample = arrivals / window
+            self.rate = sample if self.rate is None else self.alpha * sample + (1 - self.alpha) * self.rate
+        if arrivals >= self.target:
+            # A full poll's worth (or a backlog): come back as soon as allowed
+            self.interval = self.min_interval
+        elif self.rate:
+            # An idle poll divides the rate by 1/(1 - alpha), so the interval backs off geometrically
+            self.interval = self._clamp(self.target / self.rate)
+        else:
+            self.interval = self._clamp(self.interval * 2)
+        return self.interval
+
+    def failed(self):
+        """Back off after a failed run."""
+        self.interval = self._clamp(self.interval * 2)
+        return self.interval
+
+
+def run_daemon(engine, poller=None, on_run=None, install_signals=True, **options):
+    """Run `engine` until stop() is called or SIGTERM/SIGINT arrives.
+
+    `options` are passed to every engine.run(). `on_run(metrics)` is called
+    after each run, failed runs included. A signal lets the run in progress
+    commit its current page and then returns. Returns the number of runs.
+    """
+    poller = poller or AdaptivePoller()
+    stopping = engine.stopping
+
+    def handle_signal(signum, frame):
+        print({"info": "daemon_stop_requested", "signal": signal.Signals(signum).name})
+        engine.stop()
+
+    previous = {}
+    if install_signals:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous[sig] = signal.signal(sig, handle_signal)
+
+    print({"info": "daemon_started", "min_interval": poller.min_interval, "max_interval": poller.max_interval,
+           "target": poller.target})
+    runs = 0
+    last_start = None
+    try:
+        while not stopping.is_set():
+            started = time.monotonic()
+            window = started - last_start if last_start is not None else 0.0
+            last_start = started
+            metrics = SyncMetrics()
+            try:
+                engine.ping()
+                engine.run(metrics, **options)
+                interval = poller.observe(metrics.get('records_new'), window)
+            except Exception as e:
+                # Errors were printed where they happened; keep the daemon alive
+                print({"error": "daemon_run_failed", "exception": str(e)})
+                metrics.incr('runs_failed')
+                interval = poller.failed()
+            runs += 1
+            metrics.set('poll_interval_seconds', round(interval, 3))
+            metrics.set('arrival_rate_per_second', round(poller.rate or 0.0, 6))
+            if on_run is not None:
+                on_run(metrics)
+            # Sleep the rest of the interval, waking up at once on a stop request
+            stopping.wait(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+        print({"info": "daemon_stopped", "runs": runs})
+    return runs
@@ -0,0 +1,106 @@
+"""MySQL connection layer: a lazily created mysql.connector pool and transient-error handling.
+
+Connections come from a mysql.connector.pooling pool (explicit autocommit
+off, session reset when returned), so repeated runs in one process, the
+daemon and parallel engines reuse server connections instead of opening new
+ones. A connection is pinged (and reconnected) before a run; a batch that
+fails with a transient error (lost connection, deadlock, lock wait timeout)
+is retried on a fresh connection by the engine.
+"""
+import threading
+import time
+
+# Client/server error numbers worth retrying on a fresh connection
+TRANSIENT_ERRNOS = frozenset({
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    1213,  # ER_LOCK_DEADLOCK
+    2003,  # CR_CONN_HOST_ERROR
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+})
+
+
+def is_transient(exc):
+    """True for MySQL errors that a reconnect-and-retry can get past."""
+    errno = getattr(exc, 'errno', None)
+    if errno in TRANSIENT_ERRNOS:
+        return True
+    try:
+        from mysql.connector import errors
+    except ImportError:
+        return False
+    # OperationalError/InterfaceError without an errno are connection-level failures
+    return isinstance(exc, (errors.OperationalError, errors.InterfaceError)) and errno is None
+
+
+class MySQLPool:
+    """Connection pool created on first use from a SyncConfig.
+
+    `connection()` waits up to `timeout` seconds when every pooled connection
+    is in use (parallel engines sharing one pool). Closing a pooled connection
+    returns it to the pool.
+    """
+
+    def __init__(self, config, name='airtable_sync'):
+        self.config = config
+        self.name = name
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return max(1, int(self.config.mysql_pool_size or 1))
+
+    def _create(self):
+        from mysql.connector import pooling
+
+        params = self.config.mysql_params()
+        params.update(
+            autocommit=False,
+            connection_timeout=int(self.config.mysql_connect_timeout),
+        )
+        if self.config.mysql_local_infile:
+            params['allow_local_infile'] = True
+        return pooling.MySQLConnectionPool(
+            pool_name=self.name,
+            pool_size=self.size,
+            pool_reset_session=True,
+            **params,
+        )
+
+    def connection(self, timeout=30.0):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._create()
+        from mysql.connector.errors import PoolError
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._pool.get_connection()
+            except PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+
+def release(conn):
+    """Close `conn` (back to its pool when pooled), ignoring errors from a dead connection."""
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def ensure_table(mysql_conn, cursor, table, columns):
+    """CREATE TABLE IF NOT EXISTS `table` (`columns`) and commit.
+
+    DDL commits implicitly in MySQL, so call it before any data is written.
+    """
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    mysql_conn.commit()
@@ -0,0 +1,428 @@
+"""Dimension lookups (predios, personal, moviles) and the DimensionCache in front of them."""
+import threading
+import time
+
+from .db import is_transient
+from .names import NameIndex, load_catalog, name_key
+
+INSERT_PREDIO_SQL = "INSERT INTO moviles_predios (id, nombre) VALUES (%s, %s)"
+INSERT_PERSONAL_SQL = (
+    "INSERT INTO moviles_personal (nombre, apellido, dni, cuit, baja, empresa_id, fecha_nacimiento) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+)
+INSERT_MOVIL_SQL = "INSERT INTO moviles_movil (empresa_id, patente, marca, modelo, anio, baja) VALUES (%s, %s, %s, %s, %s, %s)"
+
+# Values per WHERE ... IN (...) lookup, well below max_allowed_packet for any page size
+IN_CHUNK = 500
+
+
+def get_or_create_predio(cursor, predio_id):
+    """Lookup or create predio by its id (not nombre). 
+    
+    The Airtable 'Origen' field contains the predio id (e.g. '59400').
+    If the predio exists by id, return it; otherwise create a new predio 
+    with that id and a default nombre.
+    """
+    table = 'moviles_predios'
+    # If it's not numeric, return None (or you can insert with that string as nombre)
+    pid = parse_predio_id(predio_id)
+    if pid is None:
+        return None
+    
+    # Check if predio with this id exists
+    cursor.execute(f"SELECT id FROM {table} WHERE id = %s", (pid,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    
+    return create_predio(cursor, pid)
+
+
+def parse_predio_id(predio_id):
+    """Return the numeric predio id from an Airtable 'Origen' value, or None."""
+    if not predio_id:
+        return None
+    try:
+        return int(predio_id)
+    except Exception:
+        return None
+
+
+def create_predio(cursor, pid):
+    # Create new predio with given id and a default nombre
+    # Note: if your schema has id as auto-increment, you may need to adjust this logic
+    # For now, we'll insert with explicit id
+    cursor.execute(INSERT_PREDIO_SQL, predio_row(pid))
+    return cursor.lastrowid if cursor.lastrowid else pid
+
+
+def predio_row(pid):
+    return (pid, f"Predio {pid}")
+
+
+def get_or_create_personal(cursor, cuit, fields, empresa_id=None):
+    table = 'moviles_personal'
+    cursor.execute(f"SELECT id FROM {table} WHERE cuit = %s", (cuit,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+
+    return create_personal(cursor, cuit, fields, empresa_id=empresa_id)
+
+
+def personal_name_from_fields(fields):
+    """Return the (nombre, apellido) pair stored for a chofer created from `fields`."""
+    nombre = fields.get('Chofer_nombre') or fields.get('Chofer') or fields.get('Nombre') or ''
+    apellido = fields.get('Chofer_apellido') or ''
+    return nombre, apellido
+
+
+def create_personal(cursor, cuit, fields, empresa_id=None):
+    cursor.execute(INSERT_PERSONAL_SQL, personal_row(cuit, fields, empresa_id=empresa_id))
+    return cursor.lastrowid
+
+
+def personal_row(cuit, fields, empresa_id=None):
+    """INSERT_PERSONAL_SQL parameters for a chofer created from a record's `fields`."""
+    nombre, apellido = personal_name_from_fields(fields)
+    dni = fields.get('DNI') or ''
+
+    # Determine fecha_nacimiento: try common field names and formats, otherwise use default
+    fecha_nac_raw = fields.get('Fecha_Nacimiento') or fields.get('fecha_nacimiento') or fields.get('FechaNacimiento') or fields.get('Fecha de Nacimiento')
+    fecha_nac = None
+    if fecha_nac_raw:
+        from datetime import datetime
+        # Try ISO or common formats
+        for fmt in (None, '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+            try:
+                if fmt is None:
+                    # try fromisoformat (handles many ISO variants)
+                    fecha_nac = datetime.fromisoformat(fecha_nac_raw).date()
+                else:
+                    fecha_nac = datetime.strptime(fecha_nac_raw, fmt).date()
+                break
+            except Exception:
+                fecha_nac = None
+                continue
+
+    # If still not parsed, set a safe default (indicates unknown)
+    if not fecha_nac:
+        fecha_nac = '1900-01-01'
+
+    return (nombre, apellido, dni, cuit, False, empresa_id, fecha_nac)
+
+
+def get_or_create_movil(cursor, patente, fields, empresa_id=None):
+    table = 'moviles_movil'
+    cursor.execute(f"SELECT id FROM {table} WHERE patente = %s", (patente,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+
+    return create_movil(cursor, patente, fields, empresa_id=empresa_id)
+
+
+def create_movil(cursor, patente, fields, empresa_id=None):
+    cursor.execute(INSERT_MOVIL_SQL, movil_row(patente, fields, empresa_id=empresa_id))
+    return cursor.lastrowid
+
+
+def movil_row(patente, fields, empresa_id=None):
+    """INSERT_MOVIL_SQL parameters for a movil created from a record's `fields`."""
+    marca = fields.get('Marca') or fields.get('marca') or ''
+    modelo = fields.get('Modelo') or fields.get('modelo') or ''
+    anio = None
+    try:
+        anio_val = fields.get('Anio') or fields.get('anio') or fields.get('Año')
+        if anio_val:
+            anio = int(anio_val)
+    except Exception:
+        anio = None
+    # Ensure anio is non-null to avoid inserting NULL into NOT NULL column; use 0 as safe default
+    if anio is None:
+        anio = 0
+
+    return (empresa_id, patente, marca, modelo, anio, False)
+
+
+def _chunks(values, size=IN_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _dim_key(value):
+    """Normalize a lookup value the way MySQL's default *_ci collations compare it."""
+    if value is None:
+        return None
+    return str(value).strip().casefold()
+
+
+class DimensionCache:
+    """In-memory lookup cache for predios, personal and moviles.
+
+    The same few trucks, drivers and predios repeat across thousands of viajes,
+    so the dimension tables are read once per run (load) and lookups are served
+    from dicts afterwards. Misses fall through to the create_* helpers and the
+    new rows are added to the cache.
+
+    Entries for rows created in the current transaction are journaled so they
+    can be dropped again when a savepoint or the transaction is rolled back
+    (mark/undo), and become permanent on commit.
+
+    resolve_page() handles a whole page's misses set-wise before the records
+    are resolved one by one, so the per-record lookups are all cache hits.
+
+    Choferes without a CUIT are matched by name through a fuzzy NameIndex
+    over moviles_personal, then through the CUITs of the `choferes_catalog`
+    file (the PWA's choferes.json); only a name found in neither creates a
+    new person.
+    """
+
+    def __init__(self, choferes_catalog=None):
+        self.predios = set()
+        self.personal_by_cuit = {}
+        self.personal_by_name = NameIndex()
+        self.movil_by_patente = {}
+        self.choferes_catalog = choferes_catalog
+        self.catalog = NameIndex()
+        self._journal = []
+
+    def _remember(self, container, key, value=None):
+        if isinstance(container, set):
+            if key in container:
+                return
+            container.add(key)
+        else:
+            if key in container:
+                return
+            container[key] = value
+        self._journal.append((container, key))
+
+    def mark(self):
+        return len(self._journal)
+
+    def undo(self, mark=0):
+        """Forget entries created after `mark` (their rows were rolled back)."""
+        while len(self._journal) > mark:
+            container, key = self._journal.pop()
+            if isinstance(container, set):
+                container.discard(key)
+            else:
+                container.pop(key, None)
+
+    def commit(self):
+        self._journal = []
+
+    def load(self, cursor):
+        self.predios = set()
+        cursor.execute("SELECT id FROM moviles_predios")
+        for (pid,) in cursor.fetchall():
+            self.predios.add(int(pid))
+
+        self.personal_by_cuit = {}
+        self.personal_by_name = NameIndex()
+        cursor.execute("SELECT id, cuit, nombre, apellido FROM moviles_personal ORDER BY id")
+        for pid, cuit, nombre, apellido in cursor.fetchall():
+            # keep the lowest id, which is what `SELECT ... LIMIT 1` would usually return;
+            # rows created without a CUIT must not match every other CUIT-less chofer
+            key = _dim_key(cuit)
+            if key:
+                self.personal_by_cuit.setdefault(key, pid)
+            self.personal_by_name.setdefault(name_key(nombre, apellido), pid)
+        self.catalog = load_catalog(self.choferes_catalog)
+
+        self.movil_by_patente = {}
+        cursor.execute("SELECT id, patente FROM moviles_movil ORDER BY id")
+        for mid, patente in cursor.fetchall():
+            self.movil_by_patente.setdefault(_dim_key(patente), mid)
+
+        print({
+            "info": "dimension_cache_loaded",
+            "predios": len(self.predios),
+            "personal": len(self.personal_by_cuit),
+            "choferes_catalog": len(self.catalog),
+            "moviles": len(self.movil_by_patente),
+        })
+        return self
+
+    def predio(self, cursor, predio_id):
+        pid = parse_predio_id(predio_id)
+        if pid is None:
+            return None
+        if pid in self.predios:
+            return pid
+        new_id = create_predio(cursor, pid)
+        self._remember(self.predios, new_id)
+        return new_id
+
+    def personal(self, cursor, cuit, fields, empresa_id=None):
+        key = _dim_key(cuit)
+        pid = self.personal_by_cuit.get(key) if key else None
+        if pid is not None:
+            return pid
+        pid = create_personal(cursor, cuit, fields, empresa_id=empresa_id)
+        if key:
+            self._remember(self.personal_by_cuit, key, pid)
+        self._remember(self.personal_by_name, name_key(*personal_name_from_fields(fields)), pid)
+        return pid
+
+    def personal_by_chofer_name(self, cursor, chofer_name, fields, empresa_id=None):
+        """Resolve a chofer known only by name, creating it only when nobody matches."""
+        pid = self.personal_by_name.match(chofer_name)
+        if pid is not None:
+            return pid
+        cuit = self.catalog.match(chofer_name)
+        if cuit:
+            return self.personal(cursor, cuit, fields, empresa_id=empresa_id)
+        # Unknown name and no CUIT: created without one, then found by name next time
+        pid = self.personal(cursor, '', fields, empresa_id=empresa_id)
+        self._remember(self.personal_by_name, name_key(chofer_name), pid)
+        return pid
+
+    def movil(self, cursor, patente, fields, empresa_id=None):
+        key = _dim_key(patente)
+        mid = self.movil_by_patente.get(key)
+        if mid is not None:
+            return mid
+        mid = create_movil(cursor, patente, fields, empresa_id=empresa_id)
+        if mid:
+            self._remember(self.movil_by_patente, key, mid)
+        return mid
+
+    def resolve_page(self, cursor, rows, empresa_id=None):
+        """Look up and create every predio, chofer and movil a page refers to, set-wise.
+
+        Keys missing from the cache are first looked up with one
+        WHERE ... IN (...) query per table (rows created by another process
+        since load()), and the ones still missing are inserted with one
+        executemany each, so a backfill of an empty database costs a constant
+        number of queries per page. New rows are journaled like single
+        creates, so a rolled back batch forgets them. If a bulk insert fails
+        its keys are left to the per-record path, which isolates the bad
+        record.
+        """
+        predios = {}
+        personal = {}
+        moviles = {}
+        for row in rows:
+            pid = parse_predio_id(row.origen_value)
+            if pid is not None and pid not in self.predios:
+                predios.setdefault(pid, pid)
+            if row.cuit:
+                key = _dim_key(row.cuit)
+                if key not in self.personal_by_cuit and key not in personal:
+                    personal[key] = (row.cuit, row.fields)
+            if row.patente:
+                key = _dim_key(row.patente)
+                if key not in self.movil_by_patente and key not in moviles:
+                    moviles[key] = (row.patente, row.fields)
+        if predios:
+            self._resolve_predios(cursor, list(predios))
+        if personal:
+            self._resolve_keyed(
+                cursor, personal, 'moviles_personal', 'cuit', self.personal_by_cuit,
+                INSERT_PERSONAL_SQL, lambda cuit, fields: personal_row(cuit, fields, empresa_id=empresa_id),
+                extra='nombre, apellido',
+            )
+        if moviles:
+            self._resolve_keyed(
+                cursor, moviles, 'moviles_movil', 'patente', self.movil_by_patente,
+                INSERT_MOVIL_SQL, lambda patente, fields: movil_row(patente, fields, empresa_id=empresa_id),
+            )
+
+    def _resolve_predios(self, cursor, pids):
+        for chunk in _chunks(pids):
+            placeholders = ','.join(['%s'] * len(chunk))
+            cursor.execute(f"SELECT id FROM moviles_predios WHERE id IN ({placeholders})", tuple(chunk))
+            for (pid,) in cursor.fetchall():
+                self.predios.add(int(pid))
+        missing = [pid for pid in pids if pid not in self.predios]
+        if not missing:
+            return
+        if self._bulk_insert(cursor, INSERT_PREDIO_SQL, [predio_row(pid) for pid in missing], 'moviles_predios'):
+            for pid in missing:
+                self._remember(self.predios, pid)
+
+    def _resolve_keyed(self, cursor, wanted, table, column, index, insert_sql, make_row, extra=None):
+        # wanted: {dim key: (raw value, fields of the first record using it)}
+        def lookup(keys, remember):
+            select = f"id, {column}" + (f", {extra}" if extra else '')
+            for chunk in _chunks([wanted[k][0] for k in keys]):
+                placeholders = ','.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f"SELECT {select} FROM {table} WHERE {column} IN ({placeholders}) ORDER BY id", tuple(chunk)
+                )
+                for found in cursor.fetchall():
+                    key = _dim_key(found[1])
+                    if key in index:
+                        continue
+                    if remember:
+                        self._remember(index, key, found[0])
+                    else:
+                        index[key] = found[0]
+                    if extra:
+                        # personal is also indexed by name for records without a cuit
+                        key = name_key(found[2], found[3])
+                        if remember:
+                            self._remember(self.personal_by_name, key, found[0])
+                        else:
+                            self.personal_by_name.setdefault(key, found[0])
+
+        lookup(list(wanted), remember=False)
+        missing = [key for key in wanted if key not in index]
+        if not missing:
+            return
+        params = [make_row(*wanted[key]) for key in missing]
+        # Auto-increment ids of a multi-row insert are not guaranteed to be
+        # consecutive, so they are read back with one more IN query
+        if self._bulk_insert(cursor, insert_sql, params, table):
+            lookup(missing, remember=True)
+
+    def _bulk_insert(self, cursor, sql, params, table):
+        try:
+            cursor.executemany(sql, params)
+        except Exception as e:
+            if is_transient(e):
+                raise
+            print({"warning": "dimension_bulk_insert_failed", "table": table, "rows": len(params), "error": str(e)})
+            return False
+        return True
+
+
+class SharedDimensionCache:
+    """The DimensionCache of one or more engines, reloaded after `ttl` seconds.
+
+    Engines writing to the same MySQL (a multi-source run) share one
+    instance, so a chofer or movil created for one source is a cache hit for
+    the others. The cache journals the rows of the transaction in progress,
+    so `lock` is held from get() until those rows are committed
+    (engine.resolve_dimensions); that also keeps two sources from inserting
+    the same dimension row at the same time, and a TTL reload from swapping
+    the cache under a resolve in progress. Viajes are written outside it.
+    """
+
+    def __init__(self, ttl=300.0, choferes_catalog=None):
+        self.ttl = ttl
+        self.choferes_catalog = choferes_catalog
+        self.lock = threading.RLock()
+        self.cache = None
+        self._loaded_at = None
+
+    def get(self, cursor, force=False):
+        """The current DimensionCache, loaded with `cursor` when missing, stale or `force`d."""
+        with self.lock:
+            fresh = (
+                not force
+                and self.cache is not None
+                and self.ttl is not None
+                and time.monotonic() - self._loaded_at < self.ttl
+            )
+            if not fresh:
+                self.cache = DimensionCache(choferes_catalog=self.choferes_catalog).load(cursor)
+                self._loaded_at = time.monotonic()
+            return self.cache
+
+    def invalidate(self):
+        """Reload on next use (rows of a rolled back transaction may still be cached)."""
+        with self.lock:
+            self.cache = None
@@ -0,0 +1,747 @@
+"""Sync engine: resolves, writes and deletes Airtable pages against MySQL.
+
+SyncEngine holds the Airtable client, the MySQL connection, the dimension
+cache and the viajes schema, creating each one lazily on first use and
+keeping them warm across runs, so a long-lived worker or scheduler can call
+run() repeatedly without reconnecting or reloading. The command line script
+sync_airtable_to_mysql.py is a thin wrapper around it.
+"""
+import asyncio
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .airtable import AirtableClient, build_fetch_params
+from .changes import RowHashes
+from .config import ConfigError
+from .db import MySQLPool, is_transient, release
+from .dimensions import SharedDimensionCache
+from .ledger import SyncLedger
+from .metrics import CountingCursor, SyncMetrics
+from .normalize import FieldPlan, iter_normalized
+from .snapshot import open_source
+from .viajes import RecordSavepoint, ViajeBatchWriter, ViajesSchema
+from .watermark import SyncWatermark
+
+
+def prefetch(iterable, depth=1):
+    """Iterate `iterable` in a background thread, keeping up to `depth` items ready.
+
+    Used to download the next Airtable page while the current one is being
+    written to MySQL. Exceptions raised by the producer are re-raised in the
+    consumer. Closing the returned generator early stops the producer.
+    """
+    q = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((None, item)):
+                    return
+        except BaseException as e:  # propagate to the consumer thread
+            put((e, None))
+            return
+        put((None, done))
+
+    worker = threading.Thread(target=produce, name='airtable-prefetch', daemon=True)
+    worker.start()
+    try:
+        while True:
+            err, item = q.get()
+            if err is not None:
+                raise err
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def resolve_viaje(cursor, row, cache, empresa_id=None, area_id=None, placeholder_prefix=None):
+    """Turn a NormalizedViaje into a viaje dict ready to be written.
+
+    Resolves (and creates when missing) the predio, chofer and movil it refers
+    to. When the movil cannot be resolved and `placeholder_prefix` is set, a
+    placeholder movil is created under that prefix. Returns None when the
+    record has to be skipped.
+    """
+    fields = row.fields
+    origen_value = row.origen_value
+    cuit = row.cuit
+    patente = row.patente
+
+    if not patente:
+        print({"warning": "missing_patente", "record_id": row.record_id, "raw": row.patente_raw, "found_in": row.patente_source})
+
+    # Ensure origin predio exists (lookup/create by predio id)
+    origen_id = None
+    if origen_value:
+        origen_id = cache.predio(cursor, origen_value)
+
+    # Ensure personal (chofer) exists (by cuit). If no cuit, try name lookup by 'Chofer'
+    personal_id = None
+    if cuit:
+        personal_id = cache.personal(cursor, cuit, fields, empresa_id=empresa_id)
+    elif row.chofer_name:
+        # No CUIT: match the name against moviles_personal and the choferes catalog
+        personal_id = cache.personal_by_chofer_name(cursor, row.chofer_name, fields, empresa_id=empresa_id)
+
+    # Ensure movil exists
+    movil_id = None
+    if patente:
+        try:
+            movil_id = cache.movil(cursor, patente, fields, empresa_id=empresa_id)
+            if not movil_id:
+                print({"error": "movil_creation_failed", "patente": patente, "record_id": row.record_id})
+        except Exception as e:
+            movil_id = None
+            print({"error": "movil_exception", "patente": patente, "record_id": row.record_id, "exception": str(e)})
+
+    if not movil_id:
+        # If allowed, create a placeholder movil
+        if placeholder_prefix:
+            suffix = ''.join(random.choices('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=4))
+            placeholder_patente = f"{placeholder_prefix}-{suffix}"
+            try:
+                movil_id = cache.movil(cursor, placeholder_patente, fields, empresa_id=empresa_id)
+                print({"info": "created_placeholder_movil", "patente": placeholder_patente, "record_id": row.record_id, "movil_id": movil_id})
+            except Exception as e:
+                print({"error": "placeholder_movil_failed", "record_id": row.record_id, "exception": str(e)})
+                return None
+        else:
+            print({"error": "missing_movil_id", "record_id": row.record_id, "patente": patente})
+            # skip this record to avoid DB constraint violation
+            return None
+
+    # Insert viaje
+    viaje = {
+        'record_id': row.record_id,
+        'movil_id': movil_id,
+        'empresa_id': empresa_id,
+        'area_id': area_id,
+        'fecha': row.fecha,
+        'origen_id': origen_id,
+        'destino': row.destino,
+        'producto': row.producto,
+        'tn_pulpable': row.tn_pulpable,
+        'tn_aserrable': row.tn_aserrable,
+        'tn_chip': row.tn_chip,
+        'sin_actividad': row.sin_actividad,
+        'motivo': row.motivo,
+        'observaciones': row.observaciones,
+        'personal_id': personal_id,
+    }
+    return viaje
+
+
+def resolve_rows(cursor, cache, rows, empresa_id=None, area_id=None, placeholder_prefix=None):
+    """Resolve normalized records into viaje dicts; returns (viajes, skipped count).
+
+    The page's predios, choferes and moviles are resolved set-wise first
+    (DimensionCache.resolve_page); whatever a record still creates on its own
+    runs under a savepoint, so a bad record is rolled back alone. Must run
+    inside the caller's transaction.
+    """
+    skipped = 0
+    viajes = []
+    # One IN lookup and one bulk insert per dimension table for the page's new keys
+    cache.resolve_page(cursor, rows, empresa_id=empresa_id)
+    for row in rows:
+        mark = cache.mark()
+        savepoint = RecordSavepoint(cursor)
+        try:
+            viaje = resolve_viaje(savepoint, row, cache, empresa_id=empresa_id, area_id=area_id,
+                                  placeholder_prefix=placeholder_prefix)
+        except Exception as e:
+            if is_transient(e):
+                # The connection is gone: fail the batch so it is retried as a whole
+                raise
+            savepoint.rollback()
+            cache.undo(mark)
+            skipped += 1
+            print({"error": "resolve_viaje_failed", "record_id": row.record_id, "exception": str(e)})
+            continue
+        if viaje is None:
+            # Skipped record: drop whatever it created so far
+            savepoint.rollback()
+            cache.undo(mark)
+            skipped += 1
+            continue
+        savepoint.release()
+        viajes.append(viaje)
+    return viajes, skipped
+
+
+def resolve_dimensions(mysql_conn, cursor, dimensions, rows, empresa_id=None, area_id=None, placeholder_prefix=None):
+    """resolve_rows() as its own transaction: the dimension rows it creates are committed on return.
+
+    Runs under the lock of `dimensions` (a SharedDimensionCache) and takes
+    the cache from it while holding the lock, so the cache entries of the
+    open transaction are never seen by another engine sharing the cache and
+    a TTL reload cannot happen halfway. Once the lock is released the cache
+    only holds committed ids and each engine writes and commits its viajes
+    on its own connection. Must be called before the batch writes anything:
+    the reads done so far are committed first, so the lookups see the rows
+    other engines committed since. On error the transaction and its cache
+    entries are rolled back.
+    """
+    with dimensions.lock:
+        # A new REPEATABLE READ snapshot, taken after the other engines' last resolve
+        mysql_conn.commit()
+        cache = dimensions.get(cursor)
+        try:
+            result = resolve_rows(cursor, cache, rows, empresa_id, area_id, placeholder_prefix)
+            mysql_conn.commit()
+        except Exception:
+            rollback(mysql_conn, cache)
+            raise
+        cache.commit()
+    return result
+
+
+def write_rows(mysql_conn, cursor, dimensions, writer, rows, empresa_id=None, area_id=None, metrics=None,
+               placeholder_prefix=None, hashes=None):
+    """Resolve a batch of normalized records, then write it and commit it as one transaction.
+
+    With `hashes` (a RowHashes) records whose values did not change since
+    they were last written are left alone; the rest are resolved and their
+    new predios, choferes and moviles committed by resolve_dimensions()
+    against `dimensions` (a SharedDimensionCache). If the viajes cannot be
+    written or committed their transaction is rolled back and the error is
+    raised; the dimension rows stay, a retry finds them. Returns the record
+    ids that were stored and committed (unchanged ones included); only
+    those may be deleted from Airtable. Resolve, write and commit times are
+    added to `metrics`.
+    """
+    metrics = metrics if metrics is not None else SyncMetrics()
+    unchanged = []
+    viajes = []
+    try:
+        with metrics.stage('resolve'):
+            if hashes is not None:
+                rows, unchanged, digests = hashes.split(cursor, rows)
+            viajes, skipped = resolve_dimensions(mysql_conn, cursor, dimensions, rows, empresa_id, area_id,
+                                                 placeholder_prefix)
+        with metrics.stage('write'):
+            written = writer.write(viajes)
+            if hashes is not None:
+                hashes.save(cursor, digests, written)
+
+        # Commit each batch as soon as it is written
+        with metrics.stage('commit'):
+            mysql_conn.commit()
+    except Exception:
+        rollback(mysql_conn)
+        metrics.incr('batches_rolled_back')
+        raise
+    metrics.incr('records_written', len(written))
+    metrics.incr('records_unchanged', len(unchanged))
+    metrics.incr('records_skipped', skipped)
+    metrics.incr('records_failed', len(viajes) - len(written))
+    return unchanged + written
+
+
+def rollback(mysql_conn, cache=None):
+    """Roll back the current transaction and forget the cache entries it created."""
+    try:
+        mysql_conn.rollback()
+    except Exception:
+        # A lost connection cannot roll back; the server discards the transaction itself
+        pass
+    if cache is not None:
+        cache.undo()
+
+
+def rebatch(pages, size):
+    """Regroup a stream of Airtable pages into lists of `size` records (0 keeps the pages)."""
+    if not size or size <= 0:
+        yield from pages
+        return
+    batch = []
+    for page in pages:
+        for record in page:
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def run_async(pages, airtable, write_page, watermark=None, delete=False, queue_size=2, metrics=None, stop=None,
+                    delete_records=None):
+    """Asyncio sync engine that overlaps Airtable I/O with MySQL writes (--async).
+
+    A producer task pulls `pages` (normally Airtable's paginated list) into a
+    bounded queue, a consumer writes each page with `write_page(page)` (which
+    returns the committed record ids), and a delete task drains them back to
+    Airtable concurrently. Each side runs its blocking calls in its own
+    single-thread executor (the MySQL connection always stays on the same
+    thread), so wall-clock time approaches max(fetch, write) rather than
+    their sum. With `delete` the committed ids are removed from Airtable
+    (through `delete_records`, airtable.delete_records by default); when
+    a watermark is given it observes every committed page. Stage times go to
+    `metrics` (the Airtable client's by default). Setting the `stop` event
+    ends the run after the pages already fetched. Returns the number of
+    fetched records.
+    """
+    metrics = metrics if metrics is not None else airtable.metrics
+    delete_records = delete_records or airtable.delete_records
+    loop = asyncio.get_running_loop()
+    fetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='airtable-fetch')
+    write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mysql-write')
+    delete_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='airtable-delete')
+    pages_q = asyncio.Queue(maxsize=max(1, queue_size))
+    deletes_q = asyncio.Queue()
+    stats = {'fetched': 0}
+
+    async def producer():
+        try:
+            while stop is None or not stop.is_set():
+                page = await loop.run_in_executor(fetch_pool, next, pages, None)
+                if page is None:
+                    break
+                stats['fetched'] += len(page)
+                metrics.incr('records_fetched', len(page))
+                await pages_q.put(page)
+        finally:
+            await pages_q.put(None)
+
+    async def consumer():
+        page_index = 0
+        try:
+            while True:
+                page = await pages_q.get()
+                if page is None:
+                    break
+                print({"info": "processing_page", "page": page_index, "count": len(page)})
+                page_index += 1
+                written = await loop.run_in_executor(write_pool, write_page, page)
+                if watermark is not None:
+                    watermark.observe(page, written)
+                # If insert/update succeeded, optionally delete the records from Airtable
+                if delete and written:
+                    await deletes_q.put(written)
+        finally:
+            await deletes_q.put(None)
+
+    async def deleter():
+        while True:
+            record_ids = await deletes_q.get()
+            if record_ids is None:
+                break
+            await loop.run_in_executor(delete_pool, delete_records, record_ids)
+
+    tasks = [asyncio.ensure_future(t) for t in (producer(), consumer(), deleter())]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        for pool in (fetch_pool, write_pool, delete_pool):
+            pool.shutdown(wait=True)
+    return stats['fetched']
+
+
+class _WriteSession:
+    """The MySQL side of one run: connection, cursor, dimension cache and batch writer.
+
+    write() retries a batch that failed with a transient error (lost
+    connection, deadlock, lock wait timeout) on a fresh connection, up to
+    `config.mysql_retries` times with exponential backoff. The failed
+    transaction was rolled back as a whole and the upserts are keyed on
+    record_id, so replaying the batch is idempotent.
+
+    With a SyncLedger, records an earlier run already committed are not
+    written again (their ids are returned as written, so they are deleted
+    from Airtable), and the ledger follows each record from fetched to
+    committed.
+    """
+
+    def __init__(self, engine, config, metrics, ledger=None):
+        self.engine = engine
+        self.ledger = ledger
+        self.config = config
+        self.metrics = metrics
+        self.empresa_id = config.empresa_id
+        self.area_id = config.area_id
+        self.placeholder_prefix = config.placeholder_prefix if config.allow_placeholder_movil else None
+        self.cursor = None
+        self._open()
+
+    def _open(self, reload_cache=False):
+        engine = self.engine
+        self.conn = engine.mysql_conn
+        self.cursor = CountingCursor(self.conn.cursor(), self.metrics)
+        # Rows inserted by a rolled back batch may still sit in the cache; reload it after a reconnect
+        engine._dimension_cache(self.cursor, force=reload_cache)
+        if engine.schema is None:
+            try:
+                engine.schema = ViajesSchema.load(self.cursor)
+            except RuntimeError as e:
+                print({"error": "viajes_schema_invalid", "message": str(e)})
+                raise
+        self.writer = ViajeBatchWriter(self.cursor, engine.schema, batch_size=self.config.batch_size)
+        self.hashes = None
+        # Change detection needs record_id to find the row a hash belongs to
+        if engine.schema.has_record_id:
+            if not engine.hashes_ready:
+                RowHashes().ensure_table(self.conn, self.cursor)
+                engine.hashes_ready = True
+            self.hashes = RowHashes(self.empresa_id, self.area_id, skip_unchanged=not self.config.force_write)
+
+    def close(self):
+        if self.cursor is not None:
+            try:
+                self.cursor.close()
+            except Exception:
+                pass
+            self.cursor = None
+
+    def write(self, rows):
+        """Write and commit `rows`; returns the record ids that are stored in MySQL."""
+        if self.ledger is None:
+            return self._write(rows)
+        finished = self.ledger.finished([row.record_id for row in rows])
+        if finished:
+            rows = [row for row in rows if row.record_id not in finished]
+            self.metrics.incr('records_already_committed', len(finished))
+        self.ledger.mark_fetched([row.record_id for row in rows])
+        written = self._write(rows) if rows else []
+        # Marked after the MySQL commit: a crash in between only means an idempotent rewrite
+        self.ledger.mark_committed(written)
+        return list(finished) + written
+
+    def _write(self, rows):
+        """write_rows() with reconnect-and-retry on transient MySQL errors."""
+        attempt = 0
+        while True:
+            try:
+                if self.cursor is None:
+                    self._open(reload_cache=True)
+                return write_rows(self.conn, self.cursor, self.engine.dimensions, self.writer, rows, self.empresa_id,
+                                  self.area_id, metrics=self.metrics, placeholder_prefix=self.placeholder_prefix,
+                                  hashes=self.hashes)
+            except Exception as e:
+                attempt += 1
+                if not is_transient(e) or attempt > self.config.mysql_retries:
+                    raise
+                delay = self.config.mysql_retry_delay * (2 ** (attempt - 1))
+                print({"warning": "mysql_batch_retry", "attempt": attempt, "size": len(rows),
+                       "delay": delay, "error": str(e)})
+                self.metrics.incr('mysql_retries')
+                self.close()
+                self.engine.discard_connection()
+                time.sleep(delay)
+
+    def write_page(self, plan, page):
+        """Normalize a batch of Airtable records and write it."""
+        with self.metrics.stage('transform'):
+            rows = plan.normalize_page(page)
+        return self.write(rows)
+
+
+class SyncEngine:
+    """Reusable Airtable -> MySQL sync.
+
+    `airtable` and `mysql_conn` may be injected (tests, benchmarks); otherwise
+    the client is created from `config` and the connection is taken from
+    `pool` (a MySQLPool, shared between engines or created on first use) and
+    kept until close(). The dimension cache is reused by later runs for
+    `config.dimension_cache_ttl` seconds and the viajes schema for the life
+    of the connection; `dimensions` (a SharedDimensionCache) lets several
+    engines share one cache.
+    """
+
+    def __init__(self, config, airtable=None, mysql_conn=None, pool=None, dimensions=None):
+        self.config = config
+        self._airtable = airtable
+        self._mysql_conn = mysql_conn
+        self._owns_airtable = airtable is None
+        self._owns_mysql = mysql_conn is None
+        self._pool = pool
+        self.dimensions = dimensions or SharedDimensionCache(config.dimension_cache_ttl, config.choferes_catalog)
+        self.schema = None
+        # Set by stop(); runs finish the page in progress and return early
+        self.stopping = threading.Event()
+        # Opened by the first --confirm run with config.ledger set
+        self.ledger = None
+        # airtable_sync_hashes exists (checked once per engine)
+        self.hashes_ready = False
+
+    @property
+    def airtable(self):
+        if self._airtable is None:
+            self._airtable = AirtableClient.from_config(self.config)
+        return self._airtable
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = MySQLPool(self.config)
+        return self._pool
+
+    @property
+    def mysql_conn(self):
+        if self._mysql_conn is None:
+            self._mysql_conn = self.pool.connection()
+            self.schema = None
+        return self._mysql_conn
+
+    def discard_connection(self):
+        """Drop a broken connection; the next use takes a fresh one from the pool.
+
+        An injected connection cannot be replaced, so it is reconnected in place.
+        """
+        conn = self._mysql_conn
+        if conn is None:
+            return
+        if not self._owns_mysql:
+            conn.ping(reconnect=True, attempts=1, delay=0)
+            return
+        release(conn)
+        self._mysql_conn = None
+        self.schema = None
+        self.dimensions.invalidate()
+
+    def close(self):
+        """Close the connections this engine opened (injected ones are left to their owner).
+
+        A pooled MySQL connection goes back to its pool.
+        """
+        if self._airtable is not None and self._owns_airtable:
+            self._airtable.close()
+            self._airtable = None
+        if self._mysql_conn is not None and self._owns_mysql:
+            release(self._mysql_conn)
+            self._mysql_conn = None
+        if self.ledger is not None:
+            self.ledger.close()
+            self.ledger = None
+
+    def stop(self):
+        """Ask the current (and any later) run to stop after the page in progress is committed."""
+        self.stopping.set()
+
+    def ping(self):
+        """Check the MySQL connection between runs, reconnecting if the server dropped it.
+
+        A connection that cannot be revived is discarded so the next run opens
+        a new one (and reloads the schema and dimension cache with it).
+        """
+        conn = self._mysql_conn
+        if conn is None:
+            return
+        try:
+            conn.ping(reconnect=True, attempts=3, delay=1)
+        except Exception as e:
+            print({"warning": "mysql_ping_failed", "error": str(e)})
+            if not self._owns_mysql:
+                raise
+            self.discard_connection()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _dimension_cache(self, cursor, force=False):
+        return self.dimensions.get(cursor, force=force)
+
+    def run(self, metrics=None, **options):
+        """Run one sync and return its SyncMetrics.
+
+        `options` override the config's run options for this run only (e.g.
+        run(confirm=True, incremental=True)). Raises RuntimeError when Airtable
+        or the viajes schema fail; the error is printed before it is raised.
+        """
+        config = self.config.replace(**options) if options else self.config
+        config.validate()
+        metrics = metrics if metrics is not None else SyncMetrics()
+        airtable = self.airtable
+        airtable.metrics = metrics
+        if config.dry_run:
+            self._run_dry(config, airtable)
+        else:
+            self._run(config, airtable, metrics)
+        return metrics
+
+    def _run_dry(self, config, airtable):
+        # Dry-run: print records and exit
+        pages = prefetch(open_source(config, airtable, build_fetch_params(config)))
+        printed = 0
+        try:
+            for page in pages:
+                for record in page:
+                    if config.limit > 0 and printed >= config.limit:
+                        break
+                    print({"record_index": printed, "id": record.get("id"), "fields": record.get("fields", {})})
+                    printed += 1
+                if config.limit > 0 and printed >= config.limit:
+                    break
+        except RuntimeError as e:
+            print({"error": "airtable_fetch_failed", "message": str(e)})
+            raise
+        finally:
+            pages.close()
+        print({"info": "dry_run_complete", "printed": printed})
+
+    def _run(self, config, airtable, metrics):
+        if not config.writes:
+            # Simulation mode only prints what would be written
+            return self._run_session(config, airtable, None, metrics)
+        ledger = self._ledger_for(config) if config.deletes else None
+        session = _WriteSession(self, config, metrics, ledger=ledger)
+        try:
+            self._run_session(config, airtable, session, metrics)
+        finally:
+            session.close()
+
+    def _ledger_for(self, config):
+        if not config.ledger:
+            return None
+        if self.ledger is None or self.ledger.path != config.ledger:
+            if self.ledger is not None:
+                self.ledger.close()
+            self.ledger = SyncLedger(config.ledger, config.watermark_source)
+        return self.ledger
+
+    def _delete_records(self, airtable, ledger):
+        """airtable.delete_records, recording confirmed deletes in the ledger."""
+        if ledger is None:
+            return airtable.delete_records
+
+        def delete_records(record_ids):
+            results = airtable.delete_records(record_ids)
+            ledger.mark_deleted([record_id for record_id, ok in results.items() if ok])
+            return results
+        return delete_records
+
+    def _replay_deletes(self, ledger, delete_records):
+        # Committed by an earlier run that stopped before Airtable confirmed the delete
+        pending = ledger.pending_deletes()
+        if not pending:
+            return
+        print({"info": "ledger_replaying_deletes", "count": len(pending), "ledger": ledger.path})
+        results = delete_records(pending)
+        # Failed ids stay committed: deleted when fetched again, or replayed by the next run
+        missing = [record_id for record_id, ok in results.items() if not ok]
+        if missing:
+            print({"warning": "ledger_deletes_pending", "count": len(missing)})
+
+    def _run_session(self, config, airtable, session, metrics):
+        # Incremental mode: only fetch records at or after the stored watermark
+        watermark = None
+        if config.incremental and session is not None and not config.from_snapshot:
+            if not self.schema.has_record_id:
+                # The inclusive filter re-fetches the records at the mark; only record_id keeps them from doubling
+                message = f"--incremental needs a record_id column in {self.schema.table}"
+                print({"error": "incremental_needs_record_id", "message": message})
+                raise ConfigError(message)
+            watermark = SyncWatermark(config.watermark_source, field=config.watermark_field)
+            watermark.load(session.conn, session.cursor)
+            print({"info": "incremental_sync", "watermark": watermark.value, "field": watermark.field or 'createdTime'})
+        fetch_params = build_fetch_params(config, watermark)
+
+        delete = config.deletes
+        if config.confirm and not delete:
+            print({"info": "snapshot_replay_skips_airtable_deletes", "path": config.from_snapshot})
+        ledger = session.ledger if session is not None else None
+        delete_records = self._delete_records(airtable, ledger)
+        if delete and ledger is not None:
+            self._replay_deletes(ledger, delete_records)
+
+        source = rebatch(open_source(config, airtable, fetch_params), config.commit_size)
+
+        if config.use_async and session is not None:
+            try:
+                fetched = asyncio.run(run_async(
+                    source, airtable, partial(session.write_page, FieldPlan()),
+                    watermark=watermark, delete=delete, metrics=metrics, stop=self.stopping,
+                    delete_records=delete_records,
+                ))
+                self._finish_watermark(watermark, session, metrics, fetched)
+            except RuntimeError as e:
+                print({"error": "airtable_fetch_failed", "message": str(e)})
+                raise
+            print({"info": "fetched_records_count", "count": fetched})
+            return
+
+        # Pages are downloaded in a background thread one step ahead of the writer,
+        # so the first rows are written after a single round trip and memory stays
+        # bounded by the page size regardless of the Airtable backlog.
+        pages = prefetch(source)
+        plan = FieldPlan()
+        fetched = 0
+        # Writing modes normalize pages ahead of the writer, in --workers processes if asked
+        if session is not None:
+            batches = iter_normalized(pages, plan, workers=config.workers, timer=partial(metrics.stage, 'transform'))
+        else:
+            batches = ((page, None) for page in pages)
+        try:
+            for page_index, (page, rows) in enumerate(batches):
+                fetched += len(page)
+                metrics.incr('records_fetched', len(page))
+                print({"info": "processing_page", "page": page_index, "count": len(page)})
+                # Simulation mode unless --mysql or --confirm is provided
+                if session is None:
+                    for record in page:
+                        print({
+                            "action": "simulate_insert_or_update",
+                            "record_id": record.get("id"),
+                            "fields": record.get("fields", {}),
+                        })
+                        print({"action": "simulate_delete", "record_id": record.get("id")})
+                    continue
+
+                # Confirmed mode: perform DB insert and delete from Airtable
+                written = session.write(rows)
+
+                # If insert/update succeeded, optionally delete the records from Airtable
+                if delete and written:
+                    delete_records(written)
+
+                if watermark is not None:
+                    watermark.observe(page, written)
+
+                if self.stopping.is_set():
+                    print({"info": "sync_stopping", "after_page": page_index})
+                    break
+
+            self._finish_watermark(watermark, session, metrics, fetched)
+        except RuntimeError as e:
+            print({"error": "airtable_fetch_failed", "message": str(e)})
+            raise
+        finally:
+            pages.close()
+            print({"info": "fetched_records_count", "count": fetched})
+
+    def _finish_watermark(self, watermark, session, metrics, fetched):
+        # records_new counts arrivals since the previous run (used by the daemon's poller)
+        if watermark is None:
+            metrics.incr('records_new', fetched)
+            return
+        metrics.incr('records_new', watermark.new_records)
+        # The watermark only moves once every page of this run is committed; a
+        # stopped run may have left older records behind, so it keeps the old mark
+        if not self.stopping.is_set():
+            if session.cursor is None:
+                session._open(reload_cache=True)
+            watermark.save(session.conn, session.cursor)
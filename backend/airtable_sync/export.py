@@ -0,0 +1,207 @@
+"""Master-data snapshots for the PWA (pwa-app/public/data) exported from MySQL.
+
+predios.json, choferes.json and camiones.json are generated from
+moviles_predios, moviles_personal and moviles_movil, so the ids the app
+offers are exactly the ones the sync resolves against. Each dataset is
+written minified with its rows sorted, under its plain name and under a
+content-hashed name (predios.<hash>.json, safe to cache forever), each with
+pre-compressed .gz and .br siblings when those are smaller. manifest.json maps every dataset to its
+current hashed file, so the app revalidates one small file and downloads
+only the datasets whose hash changed.
+
+Brotli output needs the optional `brotli` package; without it only .gz is
+written.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from functools import partial
+
+from .dimensions import predio_row
+
+try:
+    import brotli
+except ImportError:  # optional: .br siblings are skipped
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+# Hand-maintained lists that have no MySQL table; they are hashed and listed in the manifest as they are
+STATIC_DATASETS = ('productos', 'destinos', 'motivos')
+
+_HASHED_RE = re.compile(r'^(?P<name>\w+)\.(?P<hash>[0-9a-f]{10})\.json$')
+# Choferes created by the sync are named after the raw Chofer field, where the PWA sends the CUIT
+_NUMERIC_NAME_RE = re.compile(r'[\d\s./-]*')
+
+
+def query_predios(cursor, empresa_id=None):
+    cursor.execute("SELECT id, nombre FROM moviles_predios ORDER BY id")
+    # Placeholders created by the sync for unknown ids ("Predio N") are not offered
+    return [
+        {"id_Predio": int(pid), "Nombre del Predio": nombre or ''}
+        for pid, nombre in cursor.fetchall()
+        if (pid, nombre) != predio_row(pid)
+    ]
+
+
+def query_choferes(cursor, empresa_id=None):
+    sql = "SELECT id, nombre, apellido, cuit, dni FROM moviles_personal WHERE baja = 0"
+    params = ()
+    if empresa_id:
+        sql += " AND empresa_id = %s"
+        params = (empresa_id,)
+    cursor.execute(sql + " ORDER BY id", params)
+    choferes = []
+    for pid, nombre, apellido, cuit, dni in cursor.fetchall():
+        # Same "Apellido Nombre" label the app has always shown; the sync matches on the CUIT sent as dni
+        label = ' '.join(part.strip() for part in (apellido, nombre) if part and part.strip())
+        if _NUMERIC_NAME_RE.fullmatch(label):
+            continue
+        choferes.append({"id": str(pid), "nombre": label, "dni": cuit or dni or ''})
+    return choferes
+
+
+def query_camiones(cursor, empresa_id=None, placeholder_prefix=None):
+    sql = "SELECT id, modelo, patente FROM moviles_movil WHERE baja = 0"
+    params = ()
+    if empresa_id:
+        sql += " AND empresa_id = %s"
+        params = (empresa_id,)
+    if placeholder_prefix:
+        # Placeholder moviles (<prefix>-XXXX, created by the sync for unknown patentes) are not real trucks
+        sql += " AND patente NOT LIKE %s"
+        params += (_like_escape(placeholder_prefix) + '-%',)
+    cursor.execute(sql + " ORDER BY id", params)
+    return [{"id": str(mid), "modelo": modelo or '', "patente": patente or ''} for mid, modelo, patente in cursor.fetchall()]
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+MYSQL_DATASETS = {
+    'predios': query_predios,
+    'choferes': query_choferes,
+    'camiones': query_camiones,
+}
+
+
+def encode(data):
+    """Minified, key-sorted UTF-8 JSON, so equal data always hashes the same."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def _write_atomic(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as fh:
+        fh.write(payload)
+    os.replace(tmp, path)
+
+
+def _write_sibling(path, payload, compressed):
+    # Tiny files grow when compressed; the server then sends the plain file
+    if len(compressed) < len(payload):
+        _write_atomic(path, compressed)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _write_with_siblings(path, payload):
+    """Write `path` plus .gz (and .br) siblings; returns the compressed sizes."""
+    _write_atomic(path, payload)
+    # mtime=0 keeps the .gz byte-identical across exports of the same data
+    gz = gzip.compress(payload, compresslevel=9, mtime=0)
+    _write_sibling(path + '.gz', payload, gz)
+    sizes = {'gzip_bytes': len(gz)}
+    if brotli is not None:
+        br = brotli.compress(payload, quality=11)
+        _write_sibling(path + '.br', payload, br)
+        sizes['brotli_bytes'] = len(br)
+    return sizes
+
+
+def write_dataset(out_dir, name, payload, plain=True):
+    """Write one dataset; returns its manifest entry."""
+    digest = hashlib.sha256(payload).hexdigest()
+    hashed = f"{name}.{digest[:10]}.json"
+    entry = {'file': hashed, 'sha256': digest, 'bytes': len(payload)}
+    entry.update(_write_with_siblings(os.path.join(out_dir, hashed), payload))
+    if plain:
+        # Unversioned copy for older app builds and direct links
+        _write_with_siblings(os.path.join(out_dir, f"{name}.json"), payload)
+    return entry
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def prune(out_dir, keep):
+    """Remove hashed files not referenced by `keep` (current and previous manifests)."""
+    removed = []
+    for filename in os.listdir(out_dir):
+        base = filename
+        for ext in ('.gz', '.br'):
+            if base.endswith(ext):
+                base = base[:-len(ext)]
+        if _HASHED_RE.match(base) and base not in keep:
+            os.remove(os.path.join(out_dir, filename))
+            removed.append(filename)
+    return removed
+
+
+def export_master_data(cursor, out_dir, empresa_id=None, placeholder_prefix=None):
+    """Export the MySQL datasets to `out_dir`, version the static ones and write manifest.json.
+
+    Placeholder rows made up by the sync are left out: "Predio N" predios,
+    choferes named by a CUIT and moviles whose patente starts with
+    `placeholder_prefix`. Files of the previous manifest are kept for one more
+    export, so an app that read the old manifest can still fetch what it
+    points to.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(out_dir)
+    queries = dict(MYSQL_DATASETS, camiones=partial(query_camiones, placeholder_prefix=placeholder_prefix))
+    files = {}
+    for name, query in queries.items():
+        rows = query(cursor, empresa_id=empresa_id)
+        files[name] = write_dataset(out_dir, name, encode(rows))
+        files[name]['rows'] = len(rows)
+    for name in STATIC_DATASETS:
+        path = os.path.join(out_dir, f"{name}.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+        # The hand-edited file is left as is; only its versioned copy is minified
+        files[name] = write_dataset(out_dir, name, encode(data), plain=False)
+        files[name]['rows'] = len(data)
+
+    manifest = {
+        'version': 1,
+        'generated_at': datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+        'files': files,
+    }
+    old_files = previous.get('files', {})
+    if {n: e['sha256'] for n, e in old_files.items()} == {n: e['sha256'] for n, e in files.items()}:
+        # Nothing changed: keep the old timestamp so the manifest's ETag stays valid too
+        manifest['generated_at'] = previous.get('generated_at', manifest['generated_at'])
+    _write_atomic(os.path.join(out_dir, MANIFEST), encode(manifest))
+
+    keep = {e['file'] for e in files.values()} | {e.get('file') for e in old_files.values()}
+    removed = prune(out_dir, keep)
+    print({
+        "info": "master_data_exported",
+        "out_dir": out_dir,
+        "files": {n: {'file': e['file'], 'rows': e['rows'], 'bytes': e['bytes'], 'gzip_bytes': e['gzip_bytes']}
+                  for n, e in files.items()},
+        "pruned": len(removed),
+    })
+    return manifest
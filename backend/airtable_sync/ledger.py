@@ -0,0 +1,108 @@
+"""Local durable ledger of Airtable record states for --confirm runs (--ledger)."""
+import sqlite3
+import threading
+import time
+
+FETCHED = 'fetched'
+COMMITTED = 'committed'
+DELETED = 'deleted'
+
+# Deleted entries are only kept to answer a late re-fetch; older ones are pruned on open
+DELETED_RETENTION_SECONDS = 30 * 24 * 3600
+
+
+class SyncLedger:
+    """Per-record state (fetched -> committed -> deleted) in a local SQLite file.
+
+    A record is marked committed only after its MySQL transaction commits and
+    deleted only after Airtable confirms the delete. A restarted run first
+    replays the deletes of committed records, then skips records the ledger
+    already has as committed when they are fetched again (they go straight to
+    the delete queue), so a crashed --confirm run is neither re-written nor
+    duplicated in MySQL. States are keyed by source (base/table), so one file
+    can serve several tables.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self._lock = threading.Lock()
+        # Shared by the write and delete threads of the async engine, serialized by _lock
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "source TEXT NOT NULL, record_id TEXT NOT NULL, state TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (source, record_id))"
+        )
+        self.db.execute(
+            "DELETE FROM records WHERE state = ? AND updated_at < ?",
+            (DELETED, time.time() - DELETED_RETENTION_SECONDS),
+        )
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def _mark(self, record_ids, state, sql=None):
+        if not record_ids:
+            return
+        now = time.time()
+        with self._lock:
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                sql or (
+                    "INSERT INTO records (source, record_id, state, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (source, record_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at"
+                ),
+                [(self.source, record_id, state, now) for record_id in record_ids],
+            )
+            self.db.execute("COMMIT")
+
+    def mark_fetched(self, record_ids):
+        """Record ids about to be written (kept as fetched if the write fails)."""
+        # A committed or deleted record never moves back to fetched
+        self._mark(record_ids, FETCHED, sql=(
+            "INSERT INTO records (source, record_id, state, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, record_id) DO UPDATE SET updated_at = excluded.updated_at "
+            f"WHERE records.state = '{FETCHED}'"
+        ))
+
+    def mark_committed(self, record_ids):
+        self._mark(record_ids, COMMITTED)
+
+    def mark_deleted(self, record_ids):
+        self._mark(record_ids, DELETED)
+
+    def finished(self, record_ids):
+        """{record_id: state} for the ids already committed (or deleted) by an earlier run."""
+        states = {}
+        ids = list(record_ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                for record_id, state in self.db.execute(
+                    f"SELECT record_id, state FROM records WHERE source = ? AND record_id IN ({placeholders}) "
+                    "AND state IN (?, ?)",
+                    (self.source, *chunk, COMMITTED, DELETED),
+                ):
+                    states[record_id] = state
+        return states
+
+    def pending_deletes(self):
+        """Ids committed to MySQL whose Airtable delete never completed."""
+        with self._lock:
+            return [
+                rid for (rid,) in self.db.execute(
+                    "SELECT record_id FROM records WHERE source = ? AND state = ? ORDER BY updated_at",
+                    (self.source, COMMITTED),
+                )
+            ]
+
+    def counts(self):
+        with self._lock:
+            return dict(self.db.execute(
+                "SELECT state, COUNT(*) FROM records WHERE source = ? GROUP BY state", (self.source,)
+            ).fetchall())
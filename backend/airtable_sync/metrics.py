@@ -0,0 +1,182 @@
+"""Run metrics for the Airtable -> MySQL sync.
+
+A SyncMetrics instance collects wall-clock time per stage (fetch, transform,
+resolve, write, commit, delete) and counters such as SQL statements by verb,
+HTTP requests by method, retries and time spent sleeping on backoff or on the
+rate limiter. At the end of a run it is printed as a JSON summary and can be
+written as a Prometheus textfile for node_exporter's textfile collector.
+
+Stages run on different threads in the pipelined engines (prefetch, --async),
+so their times can overlap and add up to more than the run's elapsed time.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ('fetch', 'transform', 'resolve', 'write', 'commit', 'delete')
+
+
+class SyncMetrics:
+    """Thread-safe stage timers and counters for one sync run."""
+
+    def __init__(self, prefix='airtable_sync'):
+        self.prefix = prefix
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {name: [0.0, 0] for name in STAGES}
+        self.counters = {}
+        self.labeled = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block and add it to stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+
+    def incr(self, name, value=1, label=None):
+        """Add `value` to counter `name`, or to its `label` series when given."""
+        with self._lock:
+            if label is None:
+                self.counters[name] = self.counters.get(name, 0) + value
+            else:
+                series = self.labeled.setdefault(name, {})
+                series[label] = series.get(label, 0) + value
+
+    def set(self, name, value):
+        """Set gauge-like counter `name` to `value`."""
+        with self._lock:
+            self.counters[name] = value
+
+    def merge(self, other):
+        """Add the stage times and counters of `other` (another run, e.g. one source of a multi-source sync)."""
+        with other._lock:
+            stages = {name: tuple(entry) for name, entry in other.stages.items()}
+            counters = dict(other.counters)
+            labeled = {name: dict(series) for name, series in other.labeled.items()}
+        for name, (seconds, calls) in stages.items():
+            self.add_time(name, seconds, calls)
+        for name, value in counters.items():
+            self.incr(name, value)
+        for name, series in labeled.items():
+            for label, value in series.items():
+                self.incr(name, value, label=label)
+        return self
+
+    def get(self, name, default=0):
+        return self.counters.get(name, default)
+
+    def elapsed(self):
+        return time.perf_counter() - self._t0
+
+    def summary(self):
+        """Plain dict with elapsed time, per-stage seconds/calls and all counters."""
+        elapsed = self.elapsed()
+        with self._lock:
+            stages = {
+                name: {'seconds': round(seconds, 6), 'calls': calls}
+                for name, (seconds, calls) in self.stages.items()
+            }
+            counters = {name: _round(value) for name, value in self.counters.items()}
+            for name, series in self.labeled.items():
+                counters[name] = {label: _round(value) for label, value in sorted(series.items())}
+        written = counters.get('records_written', 0)
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'elapsed_seconds': round(elapsed, 6),
+            'records_per_second': round(written / elapsed, 3) if elapsed and written else 0.0,
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        p = self.prefix
+        summary = self.summary()
+        lines = [
+            f"# HELP {p}_last_run_timestamp_seconds Unix time the last sync run started.",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {self.started:.3f}",
+            f"# HELP {p}_elapsed_seconds Wall-clock duration of the last sync run.",
+            f"# TYPE {p}_elapsed_seconds gauge",
+            f"{p}_elapsed_seconds {summary['elapsed_seconds']}",
+            f"# HELP {p}_stage_seconds Time spent per stage in the last sync run.",
+            f"# TYPE {p}_stage_seconds gauge",
+        ]
+        for name, stage in summary['stages'].items():
+            lines.append(f'{p}_stage_seconds{{stage="{name}"}} {stage["seconds"]}')
+        lines += [
+            f"# HELP {p}_stage_calls Number of timed calls per stage in the last sync run.",
+            f"# TYPE {p}_stage_calls gauge",
+        ]
+        for name, stage in summary['stages'].items():
+            lines.append(f'{p}_stage_calls{{stage="{name}"}} {stage["calls"]}')
+        for name, value in sorted(summary['counters'].items()):
+            lines.append(f"# TYPE {p}_{name} gauge")
+            if isinstance(value, dict):
+                label = _LABEL_NAMES.get(name, 'label')
+                for key, v in value.items():
+                    lines.append(f'{p}_{name}{{{label}="{_escape(key)}"}} {v}')
+            else:
+                lines.append(f"{p}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the textfile atomically so the collector never reads a partial file."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            fh.write(self.prometheus())
+        os.replace(tmp, path)
+
+
+# Label used for each labeled counter in the Prometheus output
+_LABEL_NAMES = {
+    'sql_statements': 'verb',
+    'http_requests': 'method',
+    'http_responses': 'status',
+    'source_records_fetched': 'source',
+    'source_records_written': 'source',
+    'source_elapsed_seconds': 'source',
+    'source_failed': 'source',
+}
+
+
+def _round(value):
+    return round(value, 6) if isinstance(value, float) else value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class CountingCursor:
+    """MySQL cursor proxy that counts statements by their leading verb."""
+
+    def __init__(self, cursor, metrics):
+        self.cursor = cursor
+        self.metrics = metrics
+
+    def _verb(self, sql):
+        parts = sql.lstrip().split(None, 1)
+        return parts[0].upper() if parts else ''
+
+    def execute(self, sql, params=()):
+        self.metrics.incr('sql_statements', label=self._verb(sql))
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, seq_params):
+        self.metrics.incr('sql_statements', label=self._verb(sql))
+        return self.cursor.executemany(sql, seq_params)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
@@ -0,0 +1,187 @@
+"""Accent-folded, order-insensitive name index used to resolve choferes without a CUIT."""
+import json
+import re
+import unicodedata
+
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+
+# Shorter tokens (initials, "de", short surnames) must match exactly
+TYPO_MIN_LENGTH = 4
+
+
+def fold(text):
+    """Lowercase ASCII form of `text`: accents removed ("Acuña" -> "acuna"), punctuation to spaces."""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM_RE.sub(' ', text.casefold()).strip()
+
+
+def is_typo(a, b):
+    """True when token `b` is `a` with one typo: two adjacent letters swapped or a letter doubled.
+
+    Substitutions are not typos here: "maria" and "mario" are different people.
+    """
+    if a == b:
+        return True
+    if min(len(a), len(b)) < TYPO_MIN_LENGTH:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return (len(diff) == 2 and diff[1] == diff[0] + 1
+                and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]])
+    if abs(len(a) - len(b)) != 1:
+        return False
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return any(
+        longer[i] == longer[i - 1] and longer[:i] + longer[i + 1:] == shorter
+        for i in range(1, len(longer))
+    )
+
+
+def same_name(key, candidate):
+    """True when two name keys have the same tokens, up to initials and one typo.
+
+    An initial ("Santiago M.") stands for a token starting with that letter;
+    besides that at most one token may differ, by one typo (is_typo).
+    """
+    tokens = key.split()
+    others = candidate.split()
+    if len(tokens) != len(others):
+        return False
+    # Exact tokens pair up first, then initials; what is left must be a single typo
+    rest = list(others)
+    unmatched = []
+    for token in tokens:
+        if token in rest:
+            rest.remove(token)
+        else:
+            unmatched.append(token)
+    for token in [t for t in unmatched if len(t) == 1]:
+        expanded = next((other for other in rest if other.startswith(token)), None)
+        if expanded is not None:
+            rest.remove(expanded)
+            unmatched.remove(token)
+    for other in [o for o in rest if len(o) == 1]:
+        expanded = next((token for token in unmatched if token.startswith(other)), None)
+        if expanded is not None:
+            rest.remove(other)
+            unmatched.remove(expanded)
+    return not unmatched or (len(unmatched) == 1 and is_typo(unmatched[0], rest[0]))
+
+
+def name_key(*parts):
+    """Index key of a person's name: folded tokens in sorted order, so
+    "Acuña Walter Matias" and "Walter Matías ACUÑA" share a key."""
+    tokens = fold(' '.join(str(p) for p in parts if p)).split()
+    return ' '.join(sorted(tokens))
+
+
+class NameIndex:
+    """Map person names to a value (a moviles_personal id, a CUIT) with fuzzy lookups.
+
+    Exact matches on the normalized key are a dict lookup; otherwise a
+    candidate sharing a token with the name is accepted when it has the same
+    tokens up to initials and one typo (same_name: a swapped or doubled
+    letter, never a different letter), or a partial name (two or more tokens) is accepted
+    when exactly one indexed name contains all of its tokens. Either way the
+    match must point to a single value. Fuzzy hits are logged so wrong
+    assignments can be audited. Results are memoized per raw name until the
+    index changes. Supports the `in` / item assignment / pop protocol
+    DimensionCache journals against.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._by_token = {}
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __setitem__(self, key, value):
+        if not key:
+            return
+        self._values[key] = value
+        for token in key.split():
+            self._by_token.setdefault(token, set()).add(key)
+        self._memo.clear()
+
+    def setdefault(self, key, value):
+        if key and key not in self._values:
+            self[key] = value
+        return self._values.get(key)
+
+    def pop(self, key, default=None):
+        if key not in self._values:
+            return default
+        value = self._values.pop(key)
+        for token in key.split():
+            keys = self._by_token.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_token[token]
+        self._memo.clear()
+        return value
+
+    def match(self, raw_name):
+        """Value for `raw_name`, or None when no name is close enough."""
+        try:
+            return self._memo[raw_name]
+        except KeyError:
+            pass
+        key = name_key(raw_name)
+        matched = self._values.get(key) if key else None
+        if matched is None and key:
+            matched, via = self._fuzzy(key)
+            if matched is not None:
+                print({"info": "name_fuzzy_match", "name": raw_name, "matched": via})
+        self._memo[raw_name] = matched
+        return matched
+
+    def _fuzzy(self, key):
+        """(value, matched key) for a non-exact `key`, or (None, None)."""
+        candidates = set()
+        for token in key.split():
+            # Short tokens ("de", initials) would pull in half the index
+            if len(token) >= 3:
+                candidates.update(self._by_token.get(token, ()))
+        if not candidates:
+            return None, None
+        hits = [cand for cand in candidates if same_name(key, cand)]
+        if not hits:
+            # "Acuña Walter" for "Acuña Walter Matias": accept a unique name containing every token
+            tokens = set(key.split())
+            if len(tokens) < 2:
+                return None, None
+            hits = [cand for cand in candidates if tokens <= set(cand.split())]
+        values = {self._values[cand] for cand in hits}
+        if len(values) != 1:
+            # No candidate, or two different people: leave it unresolved
+            return None, None
+        return values.pop(), min(hits)
+
+
+def load_catalog(path):
+    """NameIndex of name -> CUIT from a choferes.json file ([{"nombre", "dni"}, ...]).
+
+    The PWA's choferes.json carries the CUIT in its "dni" field. Returns an
+    empty index when the file is missing or unreadable.
+    """
+    index = NameIndex()
+    if not path:
+        return index
+    try:
+        with open(path, encoding='utf-8') as fh:
+            entries = json.load(fh)
+    except (OSError, ValueError) as e:
+        print({"warning": "choferes_catalog_unreadable", "path": path, "error": str(e)})
+        return index
+    for entry in entries if isinstance(entries, list) else []:
+        cuit = str(entry.get('dni') or entry.get('cuit') or '').strip()
+        if cuit:
+            index.setdefault(name_key(entry.get('nombre')), cuit)
+    return index
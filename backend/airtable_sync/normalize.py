@@ -0,0 +1,369 @@
+"""Normalization of raw Airtable viaje records into typed rows.
+
+FieldPlan narrows the deduplicated candidate field names to the keys seen in
+the data, and normalize_page() turns a whole page into NormalizedViaje rows.
+"""
+import multiprocessing
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from functools import lru_cache
+
+DESTINOS = {
+    "ASPP": "ASERRADERO PUERTO PIRAY",
+    "PPE": "PLANTA PUERTO ESPERANZA",
+}
+
+# Quick regex: look for alphanumeric tokens of length 4-8 (common plate-like)
+_PLATE_TOKEN_RE = re.compile(r"[A-Z0-9-]{4,8}")
+_HAS_LETTER_RE = re.compile(r"[A-Z]")
+_HAS_DIGIT_RE = re.compile(r"[0-9]")
+_NUMBER_RE = re.compile(r"[-+]?[0-9]*\.?[0-9]+")
+_CUIT_RE = re.compile(r"(\d{10,12})")
+
+_FECHA_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d')
+
+# Candidate Airtable field names per logical field, in priority order.
+FIELD_CANDIDATES = {
+    'fecha': ('Fecha', 'fecha'),
+    'origen': ('Origen', 'origen'),
+    'destino': ('Destino', 'destino'),
+    'producto': ('Producto', 'producto'),
+    'tn_pulpable': ('TNPulpable', 'TN_Pulpable', 'TN Pulpable'),
+    'tn_aserrable': ('TNAserrable', 'TN_Aserrable', 'TN_Rollos'),
+    'tn_chip': ('TNChips', 'TN_Chips', 'TN_Chip'),
+    'sin_actividad': ('Sin_Actividad', 'sin_actividad'),
+    'motivo': ('Motivo_Sin_Actividad', 'motivo'),
+    'observaciones': ('Observaciones', 'observaciones'),
+    'cuit': ('CUIT', 'Cuit', 'cuit', 'Chofer_CUIT'),
+    'chofer': ('Chofer', 'chofer'),
+    'chofer_name': ('Chofer',),
+    'patente_raw': ('Patente', 'patente'),
+    'patente': (
+        'Patente', 'patente', 'Patente_text', 'Patente (texto)', 'Vehiculo', 'Vehículo', 'Vehiculo_Patente',
+        'Movil', 'movil', 'vehiculo', 'vehicle', 'vehicle_plate', 'Placa', 'placa', 'Plate', 'plate',
+        'Descripcion', 'Descripcion del Vehiculo', 'Observaciones', 'observaciones', 'Notas', 'note',
+    ),
+    # Free text fields searched for a plate-like token when no patente field is set
+    'patente_text': ('Observaciones', 'Descripcion', 'Notas', 'note'),
+}
+
+NormalizedViaje = namedtuple('NormalizedViaje', [
+    'record_id', 'fields', 'fecha', 'origen_value', 'destino', 'producto',
+    'tn_pulpable', 'tn_aserrable', 'tn_chip', 'sin_actividad', 'motivo', 'observaciones',
+    'cuit', 'chofer_name', 'patente', 'patente_raw', 'patente_source',
+])
+
+
+def _dedupe(names):
+    seen = set()
+    out = []
+    for name in names:
+        if name not in seen:
+            seen.add(name)
+            out.append(name)
+    return tuple(out)
+
+
+def normalize_patente(value):
+    """Normalize different Airtable shapes for patente into a string or None."""
+    if not value:
+        return None
+    # If it's a list, take first item
+    if isinstance(value, (list, tuple)) and value:
+        first = value[0]
+        return normalize_patente(first)
+    # If it's a dict, try common keys
+    if isinstance(value, dict):
+        return value.get('name') or value.get('Patente') or value.get('patente') or None
+    # Otherwise, coerce to string
+    try:
+        s = str(value).strip()
+        return s if s else None
+    except Exception:
+        return None
+
+
+def patente_from_text(txt):
+    """Return the first plate-like token (letters and digits, 4-8 chars) in free text."""
+    try:
+        s = str(txt)
+    except Exception:
+        return None
+    for m in _PLATE_TOKEN_RE.findall(s.upper()):
+        # rudimentary filter: must contain at least one letter and one digit
+        if _HAS_LETTER_RE.search(m) and _HAS_DIGIT_RE.search(m):
+            return m
+    return None
+
+
+def extract_patente_from_fields(fields, candidates=None, text_candidates=None):
+    """Try multiple candidate fields and regex extraction to find a patente string."""
+    if candidates is None:
+        candidates = FIELD_CANDIDATES['patente']
+    if text_candidates is None:
+        text_candidates = FIELD_CANDIDATES['patente_text']
+
+    # First try direct candidates
+    for key in candidates:
+        if key in fields:
+            p = normalize_patente(fields.get(key))
+            if p:
+                return p, key
+
+    # If not found, try to search in free text fields for a plate-like token
+    for key in text_candidates:
+        txt = fields.get(key)
+        if not txt:
+            continue
+        m = patente_from_text(txt)
+        if m:
+            return m, 'regex_from_text'
+
+    return None, None
+
+
+def map_destino(raw):
+    """Map a raw destino value using DESTINOS dict. Return the detail string.
+
+    If DESTINOS value is a dict, prefer 'detalle' or 'detail' keys; otherwise stringify.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return _map_destino_cached(raw)
+    return _map_destino(raw)
+
+
+def _map_destino(raw):
+    # Try direct match
+    try:
+        val = DESTINOS.get(raw)
+    except TypeError:
+        # unhashable shapes (lists, dicts) can't be codes
+        return raw
+    if val is None:
+        # try trimmed and upper/lower variants
+        key = str(raw).strip()
+        val = DESTINOS.get(key)
+        if val is None:
+            val = DESTINOS.get(key.upper())
+            if val is None:
+                val = DESTINOS.get(key.title())
+    if val is None:
+        return raw
+    if isinstance(val, dict):
+        return val.get('detalle') or val.get('detail') or str(val)
+    return val
+
+
+_map_destino_cached = lru_cache(maxsize=1024)(_map_destino)
+
+
+def to_float(v):
+    """Coerce an Airtable value to float, extracting the first number from text; None if impossible."""
+    try:
+        return float(v or 0)
+    except Exception:
+        # Try to extract numeric from string
+        try:
+            m = _NUMBER_RE.search(str(v).replace(',', '.'))
+            if m:
+                return float(m.group(0))
+        except Exception:
+            pass
+    return None
+
+
+def get_numeric_field(fields, candidates, default=0.0):
+    """Try multiple candidate keys in fields and coerce to float safely."""
+    for key in candidates:
+        if key in fields:
+            value = to_float(fields.get(key))
+            if value is not None:
+                return value
+    return float(default)
+
+
+@lru_cache(maxsize=4096)
+def _parse_fecha_str(value):
+    try:
+        # Try ISO first
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        pass
+    # Try common dd/mm/YYYY or dd-mm-YYYY
+    for fmt in _FECHA_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_fecha(value):
+    """Parse an Airtable date (ISO, dd/mm/YYYY or dd-mm-YYYY) into a date, or None."""
+    if not value or not isinstance(value, str):
+        return None
+    return _parse_fecha_str(value)
+
+
+class FieldPlan:
+    """Per-run field resolution plan.
+
+    Keeps, for each logical field, only the candidate names that occur in the
+    data seen so far, so normalizing a record costs a handful of dict lookups.
+    Airtable omits empty fields from each record, so the plan widens itself
+    whenever a record brings a key it has not seen yet.
+    """
+
+    def __init__(self, keys=()):
+        self.keys = set()
+        self.candidates = {}
+        self.extend(keys)
+
+    def extend(self, keys):
+        new = set(keys) - self.keys
+        if not new and self.candidates:
+            return
+        self.keys |= new
+        self.candidates = {
+            name: tuple(k for k in _dedupe(names) if k in self.keys)
+            for name, names in FIELD_CANDIDATES.items()
+        }
+
+    def first(self, fields, name):
+        # Equivalent to fields.get(a) or fields.get(b) or ... over the candidates
+        for key in self.candidates[name]:
+            value = fields.get(key)
+            if value:
+                return value
+        return None
+
+    def numeric(self, fields, name):
+        for key in self.candidates[name]:
+            if key in fields:
+                value = to_float(fields[key])
+                if value is not None:
+                    return value
+        return 0.0
+
+    def normalize(self, record):
+        """Normalize one raw Airtable record into a NormalizedViaje."""
+        fields = record.get('fields', {})
+        if not self.keys.issuperset(fields):
+            self.extend(fields)
+        first = self.first
+
+        # Resolve origen predio id (Airtable sends predio id in 'Origen' field, e.g. '59400')
+        origen_field = first(fields, 'origen')
+        if isinstance(origen_field, dict):
+            # If it's an object, try common keys for id
+            origen_value = origen_field.get('id') or origen_field.get('Id') or origen_field.get('ID')
+        else:
+            # Otherwise, treat the value as the predio id directly
+            origen_value = origen_field
+
+        # Chofer lookup by CUIT. If CUIT isn't in its own field but 'Chofer' contains a numeric CUIT, use that.
+        cuit = first(fields, 'cuit')
+        if not cuit:
+            chofer_field = first(fields, 'chofer')
+            if chofer_field:
+                m = _CUIT_RE.search(str(chofer_field))
+                if m:
+                    cuit = m.group(1)
+
+        # Patente: try multiple extraction strategies
+        patente_raw = first(fields, 'patente_raw')
+        patente, found_in = extract_patente_from_fields(fields, self.candidates['patente'], self.candidates['patente_text'])
+        if not patente:
+            patente = normalize_patente(patente_raw)
+
+        return NormalizedViaje(
+            record_id=record.get('id'),
+            fields=fields,
+            fecha=parse_fecha(first(fields, 'fecha')),
+            origen_value=origen_value,
+            destino=map_destino(first(fields, 'destino') or ''),
+            producto=first(fields, 'producto') or '',
+            tn_pulpable=self.numeric(fields, 'tn_pulpable'),
+            tn_aserrable=self.numeric(fields, 'tn_aserrable'),
+            tn_chip=self.numeric(fields, 'tn_chip'),
+            sin_actividad=bool(first(fields, 'sin_actividad') or False),
+            motivo=first(fields, 'motivo') or None,
+            observaciones=first(fields, 'observaciones') or None,
+            cuit=cuit,
+            chofer_name=first(fields, 'chofer_name') or '',
+            patente=patente,
+            patente_raw=patente_raw,
+            patente_source=found_in,
+        )
+
+    def normalize_page(self, records):
+        """Normalize a whole page of raw records in one pass, skipping records that fail.
+
+        Returns one NormalizedViaje per record rather than per-column lists:
+        every consumer (dimension resolution, row hashes, the writers) works
+        record by record, and a record that fails is dropped on its own.
+        """
+        if not self.keys:
+            # First page of the run: build the plan from its actual keys
+            keys = set()
+            for record in records:
+                keys.update(record.get('fields', {}))
+            self.extend(keys)
+        normalize = self.normalize
+        rows = []
+        for record in records:
+            try:
+                rows.append(normalize(record))
+            except Exception as e:
+                print({"error": "normalize_failed", "record_id": record.get('id'), "exception": str(e)})
+        return rows
+
+
+# One plan per worker process, reused across the pages it receives
+_worker_plan = None
+
+
+def normalize_records(records):
+    """Process-pool entry point: normalize a page with this worker's own FieldPlan."""
+    global _worker_plan
+    if _worker_plan is None:
+        _worker_plan = FieldPlan()
+    return _worker_plan.normalize_page(records)
+
+
+def iter_normalized(pages, plan, workers=0, timer=None):
+    """Yield (page, rows) for each page, normalizing in `workers` processes when > 1.
+
+    Pages are submitted in order and results consumed in order, so the output
+    is identical to serial mode; at most 2 * workers pages are in flight.
+    `timer`, if given, is a context manager factory wrapped around each
+    page's normalization (with workers, around the wait for its result).
+    """
+    timer = timer or nullcontext
+    if not workers or workers <= 1:
+        for page in pages:
+            with timer():
+                rows = plan.normalize_page(page)
+            yield page, rows
+        return
+
+    # Spawned, not forked: the parent already runs fetch, writer and HTTP threads whose locks a fork would copy
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = deque()
+        for page in pages:
+            pending.append((page, pool.submit(normalize_records, page)))
+            if len(pending) >= workers * 2:
+                done_page, future = pending.popleft()
+                with timer():
+                    rows = future.result()
+                yield done_page, rows
+        while pending:
+            done_page, future = pending.popleft()
+            with timer():
+                rows = future.result()
+            yield done_page, rows
@@ -0,0 +1,55 @@
+"""JSONL snapshots of raw Airtable pages (--snapshot-out / --from-snapshot)."""
+import gzip
+import json
+
+
+def _open_snapshot(path, mode):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def tee_snapshot(pages, path):
+    """Pass pages through unchanged while appending their raw records to a JSONL snapshot.
+
+    Files ending in .gz are gzip-compressed. One Airtable record per line,
+    exactly as returned by the API, so a snapshot can be replayed with
+    --from-snapshot after the records were deleted from Airtable.
+    """
+    count = 0
+    with _open_snapshot(path, 'w') as fh:
+        for page in pages:
+            for record in page:
+                fh.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                fh.write('\n')
+            count += len(page)
+            yield page
+    print({"info": "snapshot_written", "path": str(path), "records": count})
+
+
+def iter_snapshot_pages(path, page_size=100):
+    """Stream records from a JSONL(.gz) snapshot in pages of `page_size`, like the Airtable API."""
+    page_size = max(1, page_size or 100)
+    page = []
+    with _open_snapshot(path, 'r') as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            page.append(json.loads(line))
+            if len(page) >= page_size:
+                yield page
+                page = []
+    if page:
+        yield page
+
+
+def open_source(config, airtable, fetch_params):
+    """Pages to sync: the live Airtable table or a --from-snapshot file, tee'd to --snapshot-out."""
+    if config.from_snapshot:
+        source = iter_snapshot_pages(config.from_snapshot, config.page_size)
+    else:
+        source = airtable.iter_pages(fetch_params)
+    if config.snapshot_out:
+        source = tee_snapshot(source, config.snapshot_out)
+    return source
@@ -0,0 +1,197 @@
+"""Multi-source sync: several Airtable bases/tables into the same MySQL, concurrently (--sources).
+
+A JSON file lists the sources. Each entry overrides the SyncConfig built
+from the environment (same attribute names), so every contractor or area
+gets its own base, table, token and empresa/area::
+
+    {
+      "defaults": {"rate_limit": 5},
+      "sources": [
+        {"name": "contratista-a", "base_id": "appAAA", "table_name": "Viajes",
+         "airtable_token_env": "AIRTABLE_TOKEN_A", "empresa_id": "3", "area_id": "1"},
+        {"name": "contratista-b", "base_id": "appBBB", "table_name": "Viajes", "empresa_id": "7"}
+      ]
+    }
+
+`airtable_token_env` names the environment variable holding the source's
+token, so secrets stay out of the file. MySQL settings are shared by all
+sources and cannot be overridden per source.
+
+MultiSourceSync runs one SyncEngine per source in its own thread. Each
+engine has its own Airtable client, paced by a token bucket per base
+(Airtable's limit is per base, so tables of one base share a bucket), and
+its own connection from one MySQLPool; all of them resolve through one
+SharedDimensionCache. Fetching, the slow part, overlaps across bases, so a
+run takes about as long as its slowest source instead of the sum of all.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .airtable import AirtableClient, TokenBucket
+from .config import ConfigError, SyncConfig
+from .db import MySQLPool
+from .dimensions import SharedDimensionCache
+from .engine import SyncEngine
+from .metrics import SyncMetrics
+
+# Settings of the shared MySQL side; they come from the environment only
+SHARED_OPTIONS = frozenset({
+    'mysql_host', 'mysql_user', 'mysql_password', 'mysql_database', 'mysql_pool_size', 'mysql_connect_timeout',
+    'mysql_local_infile', 'dimension_cache_ttl', 'choferes_catalog',
+})
+
+
+def _source_config(base, entry, env):
+    entry = dict(entry)
+    name = entry.pop('name', None)
+    label = name or f"{entry.get('base_id', base.base_id)}/{entry.get('table_name', base.table_name)}"
+    token_env = entry.pop('airtable_token_env', None)
+    if token_env:
+        if not env.get(token_env):
+            raise ConfigError(f"Source {label!r}: environment variable {token_env} is not set")
+        entry['airtable_token'] = env[token_env]
+    unknown = sorted(set(entry) - set(SyncConfig.option_names()))
+    if unknown:
+        raise ConfigError(f"Source {label!r}: unknown settings {', '.join(unknown)}")
+    shared = sorted(set(entry) & SHARED_OPTIONS)
+    if shared:
+        raise ConfigError(f"Source {label!r}: {', '.join(shared)} can only be set in the environment")
+    config = base.replace(**entry)
+    try:
+        config.validate()
+    except ConfigError as e:
+        raise ConfigError(f"Source {label!r}: {e}")
+    return label, config
+
+
+def load_sources(path, base, env=None):
+    """[(name, SyncConfig)] for the sources listed in the JSON file at `path`.
+
+    `base` is the config built from the environment and the command line;
+    the file's "defaults" and then each source entry are applied on top of
+    it. Raises ConfigError for unknown settings, missing tokens and
+    duplicated names or base/table pairs (they would share a watermark).
+    """
+    env = os.environ if env is None else env
+    try:
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Cannot read sources file {path}: {e}")
+    if isinstance(data, list):
+        data = {'sources': data}
+    entries = data.get('sources') or []
+    if not entries:
+        raise ConfigError(f"No sources listed in {path}")
+    defaults = data.get('defaults') or {}
+    sources = []
+    names = set()
+    tables = set()
+    for entry in entries:
+        name, config = _source_config(base, {**defaults, **entry}, env)
+        if name in names:
+            raise ConfigError(f"Duplicated source name {name!r} in {path}")
+        if config.watermark_source in tables:
+            raise ConfigError(f"Table {config.watermark_source} is listed twice in {path}")
+        names.add(name)
+        tables.add(config.watermark_source)
+        sources.append((name, config))
+    return sources
+
+
+class MultiSourceSync:
+    """Concurrent sync of several sources with the interface of a SyncEngine.
+
+    run(), ping(), stop() and close() behave like SyncEngine's, so the
+    command line and run_daemon() drive it unchanged. run() returns the
+    merged SyncMetrics of all sources (plus source_* counters labeled by
+    source) and raises RuntimeError after every source finished if any of
+    them failed; a failing source does not stop the others.
+    """
+
+    def __init__(self, sources, pool=None):
+        if not sources:
+            raise ConfigError('No sources configured')
+        self.sources = list(sources)
+        base = self.sources[0][1]
+        self.config = base
+        self.stopping = threading.Event()
+        # One connection per engine, kept for the engine's life
+        self.pool = pool or MySQLPool(base.replace(mysql_pool_size=max(base.mysql_pool_size, len(self.sources))))
+        self.dimensions = SharedDimensionCache(base.dimension_cache_ttl, base.choferes_catalog)
+        limiters = {}
+        self.clients = []
+        self.engines = {}
+        for name, config in self.sources:
+            limiter = limiters.get(config.base_id)
+            if limiter is None and config.rate_limit:
+                limiter = limiters[config.base_id] = TokenBucket(rate=config.rate_limit)
+            client = AirtableClient.from_config(config, limiter=limiter)
+            self.clients.append(client)
+            engine = SyncEngine(config, airtable=client, pool=self.pool, dimensions=self.dimensions)
+            # stop() on any engine (or on this object) stops them all
+            engine.stopping = self.stopping
+            self.engines[name] = engine
+
+    def run(self, metrics=None, **options):
+        metrics = metrics if metrics is not None else SyncMetrics()
+        failed = []
+        with ThreadPoolExecutor(max_workers=len(self.engines), thread_name_prefix='sync-source') as executor:
+            futures = {
+                executor.submit(self._run_source, name, engine, options): name
+                for name, engine in self.engines.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                source_metrics, elapsed, error = future.result()
+                metrics.merge(source_metrics)
+                metrics.incr('source_records_fetched', source_metrics.get('records_fetched'), label=name)
+                metrics.incr('source_records_written', source_metrics.get('records_written'), label=name)
+                metrics.incr('source_elapsed_seconds', elapsed, label=name)
+                metrics.incr('source_failed', int(error is not None), label=name)
+                if error is not None:
+                    failed.append(name)
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(self.engines)} sources failed: {', '.join(sorted(failed))}")
+        return metrics
+
+    def _run_source(self, name, engine, options):
+        metrics = SyncMetrics()
+        error = None
+        try:
+            engine.run(metrics, **options)
+        except Exception as e:
+            # Errors were printed where they happened; tag them with the source
+            print({"error": "source_failed", "source": name, "exception": str(e)})
+            error = e
+        elapsed = round(metrics.elapsed(), 3)
+        print({
+            "info": "source_finished",
+            "source": name,
+            "elapsed_seconds": elapsed,
+            "records_fetched": metrics.get('records_fetched'),
+            "records_written": metrics.get('records_written'),
+        })
+        return metrics, elapsed, error
+
+    def ping(self):
+        for engine in self.engines.values():
+            engine.ping()
+
+    def stop(self):
+        self.stopping.set()
+
+    def close(self):
+        for engine in self.engines.values():
+            engine.close()
+        # The clients were injected into the engines, which leave them to their owner
+        for client in self.clients:
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,342 @@
+"""moviles_viajes column plan, single-row and batched writers."""
+from datetime import datetime
+
+from .db import is_transient
+
+
+def insert_viaje(cursor, movil_id, cliente_id, area_id, fecha, origen_id, destino, producto, tn_pulpable, tn_aserrable, tn_chip, sin_actividad, motivo, observaciones, personal_id):
+    table = 'moviles_viajes'
+    cursor.execute(
+        f"""
+        INSERT INTO {table} (movil_id, cliente_id, area_id, fecha, origen_id, destino, producto, tn_pulpable, tn_aserrable, tn_chip, 
+        sin_actividad, motivo_sin_actividad, observaciones, personal_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            movil_id,
+            cliente_id,
+            area_id,
+            fecha,
+            origen_id,
+            destino,
+            producto,
+            tn_pulpable,
+            tn_aserrable,
+            tn_chip,
+            sin_actividad,
+            motivo,
+            observaciones,
+            personal_id
+        ),
+    )
+    return cursor.lastrowid
+
+
+def get_table_columns(cursor, table_name):
+    cursor.execute(f"SHOW COLUMNS FROM {table_name}")
+    rows = cursor.fetchall()
+    return [r[0] for r in rows]
+
+
+def has_unique_index(cursor, table_name, column):
+    """True when `column` alone is covered by a unique index (or the primary key)."""
+    cursor.execute(f"SHOW INDEX FROM {table_name}")
+    indexes = {}
+    for row in cursor.fetchall():
+        # Table, Non_unique, Key_name, Seq_in_index, Column_name, ...
+        non_unique, key_name, column_name = row[1], row[2], row[4]
+        if int(non_unique) == 0:
+            indexes.setdefault(key_name, []).append(column_name)
+    return any(cols == [column] for cols in indexes.values())
+
+
+_SKIP = object()
+
+
+def _origen_column(viaje):
+    # Only link the origin predio for trips with activity and a known predio
+    if viaje['sin_actividad'] or viaje['origen_id'] is None:
+        return _SKIP
+    return viaje['origen_id']
+
+
+def _personal_column(viaje):
+    return viaje['personal_id'] or _SKIP
+
+
+# Column -> extractor plan for moviles_viajes, in insert order. Extractors get
+# the resolved viaje dict built by engine.resolve_viaje and may return _SKIP to leave
+# the column out of the statement (so the database default applies on insert
+# and the stored value is kept on update).
+VIAJE_COLUMNS = [
+    ('movil_id', lambda v: v['movil_id']),
+    # Map empresa_id env to cliente_id if provided
+    ('cliente_id', lambda v: v['empresa_id']),
+    ('area_id', lambda v: v['area_id']),
+    ('fecha', lambda v: v['fecha']),
+    ('origen_id', _origen_column),
+    ('destino', lambda v: v['destino']),
+    ('producto', lambda v: v['producto']),
+    ('tn_pulpable', lambda v: v['tn_pulpable']),
+    ('tn_aserrable', lambda v: v['tn_aserrable']),
+    ('tn_chip', lambda v: v['tn_chip']),
+    ('sin_actividad', lambda v: v['sin_actividad']),
+    ('motivo_sin_actividad', lambda v: v['motivo']),
+    ('observaciones', lambda v: v['observaciones']),
+    # Map chofer: prefer chofer_id if present
+    ('chofer_id', _personal_column),
+    # Also map personal_id column if present (user requested mapping from chofer)
+    ('personal_id', _personal_column),
+    # Include Airtable record id in insert/update
+    ('record_id', lambda v: v['record_id']),
+]
+
+
+class ViajesSchema:
+    """Column plan and prepared SQL for moviles_viajes, read once per run.
+
+    SHOW COLUMNS runs a single time at startup; every record then reuses the
+    extractor plan and the INSERT/UPDATE statements cached per column set
+    (only a handful of variants exist, depending on which optional columns a
+    record fills).
+    """
+
+    table = 'moviles_viajes'
+
+    def __init__(self, columns, unique_record_id=False):
+        self.columns = frozenset(columns)
+        self.plan = [(col, extract) for col, extract in VIAJE_COLUMNS if col in self.columns]
+        if not self.plan:
+            raise RuntimeError('No matching columns found in moviles_viajes to insert data')
+        self.has_record_id = 'record_id' in self.columns
+        # Multi-row INSERT ... ON DUPLICATE KEY UPDATE needs a unique key on record_id
+        self.unique_record_id = self.has_record_id and unique_record_id
+        self.has_created_at = 'created_at' in self.columns
+        self.has_updated_at = 'updated_at' in self.columns
+        self._insert_sql = {}
+        self._update_sql = {}
+
+    @classmethod
+    def load(cls, cursor):
+        return cls(get_table_columns(cursor, cls.table), unique_record_id=has_unique_index(cursor, cls.table, 'record_id'))
+
+    def build_row(self, viaje):
+        """Return (columns, values) for `viaje` following the column plan."""
+        cols = []
+        vals = []
+        for col, extract in self.plan:
+            val = extract(viaje)
+            if val is _SKIP:
+                continue
+            cols.append(col)
+            vals.append(val)
+        return tuple(cols), vals
+
+    def insert_sql(self, cols):
+        sql = self._insert_sql.get(cols)
+        if sql is None:
+            all_cols = list(cols)
+            # If table supports created_at or updated_at, add current timestamps for insert
+            if self.has_created_at:
+                all_cols.append('created_at')
+            if self.has_updated_at:
+                all_cols.append('updated_at')
+            placeholders = ','.join(['%s'] * len(all_cols))
+            sql = f"INSERT INTO {self.table} ({','.join(all_cols)}) VALUES ({placeholders})"
+            self._insert_sql[cols] = sql
+        return sql
+
+    def insert_params(self, vals, now):
+        params = list(vals)
+        if self.has_created_at:
+            params.append(now)
+        if self.has_updated_at:
+            params.append(now)
+        return params
+
+    def update_sql(self, cols):
+        sql = self._update_sql.get(cols)
+        if sql is None:
+            # record_id is the lookup key, no need to set it again
+            set_parts = [f"{col} = %s" for col in cols if col != 'record_id']
+            # If the table has updated_at, set it to now
+            if self.has_updated_at:
+                set_parts.append('updated_at = %s')
+            sql = f"UPDATE {self.table} SET {','.join(set_parts)} WHERE id = %s"
+            self._update_sql[cols] = sql
+        return sql
+
+    def upsert_sql(self, cols, nrows):
+        """Multi-row INSERT ... ON DUPLICATE KEY UPDATE keyed on record_id."""
+        insert = self.insert_sql(cols)
+        head, values = insert.split(' VALUES ', 1)
+        updates = [f"{col} = VALUES({col})" for col in cols if col != 'record_id']
+        if self.has_updated_at:
+            updates.append('updated_at = VALUES(updated_at)')
+        return f"{head} VALUES {','.join([values] * nrows)} ON DUPLICATE KEY UPDATE {','.join(updates)}"
+
+    def update_params(self, cols, vals, now, row_id):
+        params = [val for col, val in zip(cols, vals) if col != 'record_id']
+        if self.has_updated_at:
+            params.append(now)
+        params.append(row_id)
+        return params
+
+
+def write_viaje(cursor, schema, viaje):
+    """Insert or update one viaje (keyed by Airtable record_id when the column exists)."""
+    cols, vals = schema.build_row(viaje)
+    now = datetime.utcnow()
+    if schema.has_record_id:
+        # Check if a row with this record_id already exists
+        cursor.execute(f"SELECT id FROM {schema.table} WHERE record_id = %s", (viaje['record_id'],))
+        existing = cursor.fetchone()
+        if existing:
+            cursor.execute(schema.update_sql(cols), tuple(schema.update_params(cols, vals, now, existing[0])))
+            return existing[0]
+    cursor.execute(schema.insert_sql(cols), tuple(schema.insert_params(vals, now)))
+    return cursor.lastrowid
+
+
+class ViajeBatchWriter:
+    """Write resolved viajes in batches instead of one statement per record.
+
+    With a unique key on record_id each batch is a single multi-row
+    INSERT ... ON DUPLICATE KEY UPDATE. Otherwise the existing record_ids are
+    looked up with one IN (...) query and the rows go out through executemany.
+    If a batch fails its rows are retried one by one so a single bad record
+    does not sink the others; transient connection errors are raised instead,
+    for the engine to retry the whole batch on a fresh connection. Without a
+    record_id column a batch of several statements runs inside a savepoint,
+    so a failure also undoes the statements that already went through.
+    """
+
+    savepoint = 'viaje_batch'
+
+    def __init__(self, cursor, schema, batch_size=100):
+        self.cursor = cursor
+        self.schema = schema
+        self.batch_size = max(1, int(batch_size or 1))
+
+    def write(self, viajes):
+        """Write `viajes` and return the record ids that were stored."""
+        written = []
+        for start in range(0, len(viajes), self.batch_size):
+            batch = viajes[start:start + self.batch_size]
+            try:
+                self._write_batch(batch)
+                written.extend(v['record_id'] for v in batch)
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                print({"warning": "viaje_batch_failed", "size": len(batch), "error": str(e)})
+                written.extend(self._write_one_by_one(batch))
+        return written
+
+    def _write_one_by_one(self, batch):
+        written = []
+        for viaje in batch:
+            try:
+                write_viaje(self.cursor, self.schema, viaje)
+                written.append(viaje['record_id'])
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                print({"error": "insert_viaje_failed", "record_id": viaje["record_id"], "exception": str(e)})
+        return written
+
+    def _group(self, batch):
+        # Rows can only share a statement when they fill the same columns
+        groups = {}
+        for viaje in batch:
+            cols, vals = self.schema.build_row(viaje)
+            groups.setdefault(cols, []).append(vals)
+        return groups
+
+    def _write_batch(self, batch):
+        statements = self._statements(batch)
+        if len(statements) == 1 or self.schema.has_record_id:
+            # The one-by-one retry finds the rows already written by record_id and updates them
+            for execute, sql, params in statements:
+                execute(sql, params)
+            return
+        # Without record_id a failed statement must also undo the groups
+        # written before it, or the one-by-one retry would insert them twice
+        self.cursor.execute(f"SAVEPOINT {self.savepoint}")
+        try:
+            for execute, sql, params in statements:
+                execute(sql, params)
+        except Exception as e:
+            if not is_transient(e):
+                self.cursor.execute(f"ROLLBACK TO SAVEPOINT {self.savepoint}")
+            raise
+        self.cursor.execute(f"RELEASE SAVEPOINT {self.savepoint}")
+
+    def _statements(self, batch):
+        """[(execute, sql, params)] writing `batch`, one statement per column group."""
+        schema = self.schema
+        now = datetime.utcnow()
+        if schema.unique_record_id:
+            statements = []
+            for cols, rows in self._group(batch).items():
+                params = []
+                for vals in rows:
+                    params.extend(schema.insert_params(vals, now))
+                statements.append((self.cursor.execute, schema.upsert_sql(cols, len(rows)), tuple(params)))
+            return statements
+
+        existing = {}
+        if schema.has_record_id:
+            ids = [v['record_id'] for v in batch]
+            placeholders = ','.join(['%s'] * len(ids))
+            self.cursor.execute(
+                f"SELECT record_id, id FROM {schema.table} WHERE record_id IN ({placeholders})", tuple(ids)
+            )
+            existing = {rid: row_id for rid, row_id in self.cursor.fetchall()}
+
+        inserts = [v for v in batch if v['record_id'] not in existing]
+        updates = [v for v in batch if v['record_id'] in existing]
+        statements = []
+        for cols, rows in self._group(inserts).items():
+            statements.append((self.cursor.executemany, schema.insert_sql(cols),
+                               [tuple(schema.insert_params(vals, now)) for vals in rows]))
+        for cols, rows in self._group(updates).items():
+            record_idx = cols.index('record_id')
+            statements.append((self.cursor.executemany, schema.update_sql(cols),
+                               [tuple(schema.update_params(cols, vals, now, existing[vals[record_idx]]))
+                                for vals in rows]))
+        return statements
+
+
+class RecordSavepoint:
+    """Cursor wrapper that isolates one record's writes in a savepoint.
+
+    The SAVEPOINT is only issued before the record's first write, so records
+    whose dimensions are all cached cost no extra round trips. A failing record
+    is rolled back on its own while the rest of the transaction is kept.
+    """
+
+    name = 'sync_record'
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.active = False
+
+    def execute(self, sql, params=()):
+        if not self.active and not sql.lstrip()[:6].upper() == 'SELECT':
+            self.cursor.execute(f"SAVEPOINT {self.name}")
+            self.active = True
+        return self.cursor.execute(sql, params)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def release(self):
+        if self.active:
+            self.cursor.execute(f"RELEASE SAVEPOINT {self.name}")
+            self.active = False
+
+    def rollback(self):
+        if self.active:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {self.name}")
+            self.active = False
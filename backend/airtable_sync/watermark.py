@@ -0,0 +1,126 @@
+"""High-water mark for incremental syncs (--incremental)."""
+from datetime import datetime, timezone
+
+from .config import ConfigError
+from .db import ensure_table
+
+
+class SyncWatermark:
+    """High-water mark for incremental syncs, stored in a small MySQL table.
+
+    The mark is the largest createdTime (or the value of `field`, e.g. a
+    "Last modified" column) among the records of a run. Values are compared
+    as datetimes, so `field` must hold ISO dates or timestamps (Airtable
+    date, created and last modified fields); anything else raises
+    ConfigError. The filter is inclusive (>=), which is safe because viajes
+    are upserted by record_id; the engine refuses --incremental on a
+    moviles_viajes table without that column.
+    The new value is saved only after the run's pages have all been
+    committed: a batch that fails (rolled back, retries exhausted) aborts the
+    run, so the old mark stays and its records are fetched again. Records of
+    a committed page that were not stored were rejected for good (skipped on
+    purpose, invalid data); they would fail on every retry, so they do not
+    hold the mark back and are reported in `rejected` instead.
+    """
+
+    table = 'airtable_sync_state'
+
+    def __init__(self, source, field=None):
+        self.source = source
+        self.field = field
+        self.value = None
+        # self.value as an aware datetime, for comparisons
+        self._mark = None
+        self._max_seen = None
+        # Record ids of committed pages that were not stored (skipped or rejected records)
+        self.rejected = []
+        # Records strictly after the loaded mark, i.e. not re-fetched by the inclusive filter
+        self.new_records = 0
+
+    def load(self, mysql_conn, cursor):
+        ensure_table(mysql_conn, cursor, self.table,
+                     "source VARCHAR(191) NOT NULL PRIMARY KEY, watermark VARCHAR(64) NOT NULL, "
+                     "updated_at DATETIME NOT NULL")
+        cursor.execute(f"SELECT watermark FROM {self.table} WHERE source = %s", (self.source,))
+        row = cursor.fetchone()
+        self.value = row[0] if row else None
+        self._mark = parse_mark(self.value) if self.value else None
+        mysql_conn.commit()
+        return self.value
+
+    def formula(self):
+        """Airtable filterByFormula selecting records at or after the mark."""
+        if not self.value:
+            return None
+        expr = '{' + self.field + '}' if self.field else 'CREATED_TIME()'
+        value = self.value.replace("'", "\\'")
+        return f"NOT(IS_BEFORE({expr}, DATETIME_PARSE('{value}')))"
+
+    def record_value(self, record):
+        if self.field:
+            value = record.get('fields', {}).get(self.field)
+        else:
+            value = record.get('createdTime')
+        if not value:
+            return None
+        try:
+            return parse_mark(value)
+        except (TypeError, ValueError):
+            message = (f"Watermark field {self.field or 'createdTime'} of record {record.get('id')} "
+                       f"holds {value!r}, not an ISO date or timestamp")
+            print({"error": "watermark_value_invalid", "message": message})
+            raise ConfigError(message)
+
+    def observe(self, page, written):
+        """Track a committed page; `written` are the record ids that were stored."""
+        written = set(written)
+        for record in page:
+            if record.get('id') not in written:
+                self.rejected.append(record.get('id'))
+            value = self.record_value(record)
+            if value is None:
+                continue
+            if self._mark is None or value > self._mark:
+                self.new_records += 1
+            if self._max_seen is None or value > self._max_seen:
+                self._max_seen = value
+
+    def next_value(self):
+        candidate = self._max_seen
+        if candidate is None or (self._mark is not None and candidate <= self._mark):
+            return self.value
+        return format_mark(candidate)
+
+    def save(self, mysql_conn, cursor):
+        new_value = self.next_value()
+        if self.rejected:
+            # Not retried by later incremental runs; they stay in Airtable for a manual fix
+            print({"warning": "watermark_passes_rejected_records", "source": self.source,
+                   "count": len(self.rejected), "record_ids": self.rejected[:20]})
+        if new_value is None or new_value == self.value:
+            return self.value
+        cursor.execute(
+            f"INSERT INTO {self.table} (source, watermark, updated_at) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), updated_at = VALUES(updated_at)",
+            (self.source, new_value, datetime.utcnow()),
+        )
+        mysql_conn.commit()
+        print({"info": "watermark_advanced", "source": self.source, "from": self.value, "to": new_value})
+        self.value = new_value
+        self._mark = parse_mark(new_value)
+        return new_value
+
+
+def parse_mark(value):
+    """Aware UTC datetime of an ISO date or timestamp ('2024-05-01', '2024-05-01T12:30:00.000Z')."""
+    if not isinstance(value, str):
+        raise TypeError(f"expected an ISO string, got {type(value).__name__}")
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def format_mark(value):
+    """The mark as stored and passed to DATETIME_PARSE: UTC with milliseconds, like createdTime."""
+    return value.strftime('%Y-%m-%dT%H:%M:%S.') + f"{value.microsecond // 1000:03d}Z"
@@ -0,0 +1,4 @@
+"""Benchmark harness for the Airtable -> MySQL sync.
+
+Run from backend/ with `python -m bench.run_bench`; see run_bench.py.
+"""
@@ -0,0 +1,131 @@
+"""Local HTTP stand-in for the Airtable list and delete endpoints.
+
+Serves `GET /v0/<base>/<table>` with offset/pageSize paging and
+`DELETE /v0/<base>/<table>?records[]=...` (up to 10 ids), backed by an
+in-memory list of records. Every `inject_429_every`-th request is answered
+with 429 and `Retry-After: 0` so the client's retry path is exercised.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeAirtable:
+    """In-memory Airtable table served over HTTP on localhost."""
+
+    def __init__(self, records, inject_429_every=0, host='127.0.0.1', port=0):
+        self.records = {r['id']: r for r in records}
+        self.order = [r['id'] for r in records]
+        self.inject_429_every = inject_429_every
+        self.requests = 0
+        self.throttled = 0
+        self.deleted = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self):
+        """Count a request; True when it should be throttled."""
+        with self._lock:
+            self.requests += 1
+            if self.inject_429_every and self.requests % self.inject_429_every == 0:
+                self.throttled += 1
+                return True
+        return False
+
+    def list_page(self, offset, page_size):
+        with self._lock:
+            start = int(offset or 0)
+            ids = self.order[start:start + page_size]
+            page = [self.records[i] for i in ids if i in self.records]
+            end = start + page_size
+        body = {'records': page}
+        if end < len(self.order):
+            body['offset'] = str(end)
+        return body
+
+    def delete(self, ids):
+        with self._lock:
+            out = []
+            for rid in ids:
+                deleted = self.records.pop(rid, None) is not None
+                self.deleted += deleted
+                out.append({'id': rid, 'deleted': deleted})
+        return {'records': out}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this every
+            # keep-alive response waits on a delayed ACK (~40 ms)
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _throttle(self):
+                if fake._count():
+                    self._send(429, {'errors': [{'error': 'RATE_LIMIT_REACHED'}]}, {'Retry-After': '0'})
+                    return True
+                return False
+
+            def do_GET(self):
+                if self._throttle():
+                    return
+                query = parse_qs(urlsplit(self.path).query)
+                page_size = int(query.get('pageSize', ['100'])[0])
+                offset = query.get('offset', [None])[0]
+                self._send(200, fake.list_page(offset, min(page_size, 100)))
+
+            def do_DELETE(self):
+                if self._throttle():
+                    return
+                query = parse_qs(urlsplit(self.path).query)
+                ids = query.get('records[]', [])
+                if len(ids) > 10:
+                    self._send(422, {'error': {'type': 'INVALID_REQUEST', 'message': 'Too many records'}})
+                    return
+                self._send(200, fake.delete(ids))
+
+        return Handler
+
+    def stats(self):
+        return {
+            'http_requests': self.requests,
+            'http_throttled': self.throttled,
+            'airtable_deleted': self.deleted,
+        }
@@ -0,0 +1,146 @@
+"""Throughput benchmark for sync_airtable_to_mysql.
+
+Usage (from backend/):
+
+    python -m bench.run_bench --sizes 1000,10000,100000
+    python -m bench.run_bench --sizes 10000 --inject-429 50 --sync-args="--async"
+
+For each size the parent process generates synthetic records, serves them
+from a local fake Airtable and runs the sync in a child process against the
+SQLite MySQL stand-in, so the child's peak RSS is the sync's own. Reported
+per run: records/sec, SQL and HTTP round trips per record and peak RSS, plus
+the sync's own per-stage times with --json.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.fake_airtable import FakeAirtable
+from bench.synthetic import generate_records
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_ENV = {
+    'AIRTABLE_TOKEN': 'bench-token',
+    'AIRTABLE_BASE_ID': 'appBench',
+    'AIRTABLE_TABLE_NAME': 'Viajes',
+    'AIRTABLE_RATE_LIMIT': '0',
+    'MYSQL_HOST': 'sqlite',
+    'MYSQL_USER': 'bench',
+    'MYSQL_PASSWORD': 'bench',
+    'MYSQL_DATABASE': 'bench',
+}
+
+
+def run_child(db_path, sync_args, unique_record_id):
+    """Run one sync in this process against the SQLite stand-in; return metrics."""
+    from airtable_sync import SyncEngine
+    from bench.sqlite_mysql import Connection, Stats
+    from sync_airtable_to_mysql import build_config, parse_args
+
+    stats = Stats()
+    conn = Connection(db_path, unique_record_id=unique_record_id, stats=stats)
+    config = build_config(parse_args(sync_args))
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with SyncEngine(config, mysql_conn=conn) as engine:
+            metrics = engine.run()
+    elapsed = time.perf_counter() - start
+    out = {
+        'elapsed_s': elapsed,
+        'viajes_rows': conn.count_rows('moviles_viajes'),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stage_seconds': {name: s['seconds'] for name, s in metrics.summary()['stages'].items()},
+    }
+    out.update(stats.as_dict())
+    return out
+
+
+def run_size(size, args):
+    records = list(generate_records(size, seed=args.seed))
+    with FakeAirtable(records, inject_429_every=args.inject_429) as fake, \
+            tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, **BENCH_ENV, AIRTABLE_API_URL=fake.url)
+        cmd = [
+            sys.executable, '-m', 'bench.run_bench', '--child',
+            '--db', os.path.join(tmp, 'bench.sqlite3'),
+            '--sync-args=' + ' '.join(['--' + args.mode] + shlex.split(args.sync_args)),
+        ]
+        if args.no_unique:
+            cmd.append('--no-unique')
+        proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"sync failed for {size} records:\n{proc.stderr}")
+        child = json.loads(proc.stdout.strip().splitlines()[-1])
+        http = fake.stats()
+
+    elapsed = child['elapsed_s']
+    return {
+        'records': size,
+        'mode': args.mode,
+        'sync_args': args.sync_args,
+        'elapsed_s': round(elapsed, 3),
+        'records_per_s': round(size / elapsed, 1) if elapsed else None,
+        'sql_round_trips_per_record': round(child['sql_round_trips'] / size, 3),
+        'http_round_trips_per_record': round(http['http_requests'] / size, 4),
+        'peak_rss_mb': round(child['peak_rss_mb'], 1),
+        'viajes_rows': child['viajes_rows'],
+        'airtable_deleted': http['airtable_deleted'],
+        'http_throttled': http['http_throttled'],
+        'sql_statements': child['sql_statements'],
+        'stage_seconds': child['stage_seconds'],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Airtable -> MySQL sync with local stand-ins')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma-separated record counts (default: 1000,10000,100000)')
+    parser.add_argument('--mode', choices=('confirm', 'mysql'), default='confirm',
+                        help='confirm also deletes from the fake Airtable; mysql only writes')
+    parser.add_argument('--sync-args', default='',
+                        help='Extra flags for the sync, e.g. "--async --batch-size 500"')
+    parser.add_argument('--inject-429', type=int, default=0, metavar='N',
+                        help='Answer every Nth HTTP request with 429 (default: off)')
+    parser.add_argument('--no-unique', action='store_true',
+                        help='Create moviles_viajes without a unique key on record_id')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print one JSON object per run')
+    # Internal: run a single sync in this process
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        sys.path.insert(0, BACKEND_DIR)
+        print(json.dumps(run_child(args.db, shlex.split(args.sync_args), not args.no_unique)))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    header = f"{'records':>8} {'rec/s':>10} {'sql rt/rec':>11} {'http rt/rec':>12} {'peak RSS MB':>12} {'elapsed s':>10}"
+    if not args.json:
+        print(header)
+    for size in sizes:
+        result = run_size(size, args)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{result['records']:>8} {result['records_per_s']:>10} "
+                  f"{result['sql_round_trips_per_record']:>11} {result['http_round_trips_per_record']:>12} "
+                  f"{result['peak_rss_mb']:>12} {result['elapsed_s']:>10}")
+
+
+if __name__ == '__main__':
+    main()
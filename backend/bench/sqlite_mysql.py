@@ -0,0 +1,152 @@
+"""SQLite-backed stand-in for the subset of mysql.connector the sync uses.
+
+Translates the MySQL-only statements the sync issues (`%s` placeholders,
+SHOW COLUMNS / SHOW INDEX, ON DUPLICATE KEY UPDATE ... VALUES(col)) into
+SQLite and counts server round trips the way mysql.connector would incur
+them: one per execute/commit/rollback, one per executemany of an INSERT
+(the connector rewrites it into a multi-row statement) and one per row for
+any other executemany.
+"""
+import re
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS moviles_predios (
+    id INTEGER PRIMARY KEY, nombre TEXT);
+CREATE TABLE IF NOT EXISTS moviles_personal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT, apellido TEXT, dni TEXT, cuit TEXT,
+    baja INTEGER, empresa_id INTEGER, fecha_nacimiento TEXT);
+CREATE TABLE IF NOT EXISTS moviles_movil (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, empresa_id INTEGER, patente TEXT, marca TEXT,
+    modelo TEXT, anio INTEGER, baja INTEGER);
+CREATE TABLE IF NOT EXISTS moviles_viajes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, movil_id INTEGER, cliente_id INTEGER, area_id INTEGER,
+    fecha TEXT, origen_id INTEGER, destino TEXT, producto TEXT, tn_pulpable REAL,
+    tn_aserrable REAL, tn_chip REAL, sin_actividad INTEGER, motivo_sin_actividad TEXT,
+    observaciones TEXT, personal_id INTEGER, record_id TEXT {record_id_key},
+    created_at TEXT, updated_at TEXT);
+"""
+
+_SHOW_COLUMNS_RE = re.compile(r"\s*SHOW\s+COLUMNS\s+FROM\s+`?(\w+)`?", re.I)
+_SHOW_INDEX_RE = re.compile(r"\s*SHOW\s+INDEX\s+FROM\s+`?(\w+)`?", re.I)
+_ON_DUPLICATE_RE = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.I)
+_VALUES_FN_RE = re.compile(r"VALUES\((\w+)\)")
+
+
+def translate(sql):
+    """Rewrite a MySQL statement into its SQLite equivalent."""
+    sql = sql.replace('%s', '?')
+    if _ON_DUPLICATE_RE.search(sql):
+        sql = _ON_DUPLICATE_RE.sub('ON CONFLICT DO UPDATE SET', sql)
+        sql = _VALUES_FN_RE.sub(r'excluded.\1', sql)
+    return sql
+
+
+class Stats:
+    def __init__(self):
+        self.round_trips = 0
+        self.statements = {}
+
+    def count(self, sql, trips=1):
+        self.round_trips += trips
+        verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        self.statements[verb] = self.statements.get(verb, 0) + trips
+
+    def as_dict(self):
+        return {'sql_round_trips': self.round_trips, 'sql_statements': dict(self.statements)}
+
+
+class Cursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cur = conn.db.cursor()
+        self._rows = None
+
+    def execute(self, sql, params=()):
+        self._conn.stats.count(sql)
+        m = _SHOW_COLUMNS_RE.match(sql)
+        if m:
+            info = self._conn.db.execute(f"PRAGMA table_info({m.group(1)})").fetchall()
+            self._rows = [(col[1], col[2], 'YES', '', None, '') for col in info]
+            return
+        m = _SHOW_INDEX_RE.match(sql)
+        if m:
+            self._rows = self._show_index(m.group(1))
+            return
+        self._rows = None
+        self._cur.execute(translate(sql), tuple(params or ()))
+
+    def _show_index(self, table):
+        # (Table, Non_unique, Key_name, Seq_in_index, Column_name), like MySQL
+        rows = []
+        db = self._conn.db
+        for _, name, unique, *_ in db.execute(f"PRAGMA index_list({table})").fetchall():
+            for seq, _, column in db.execute(f"PRAGMA index_info({name})").fetchall():
+                rows.append((table, 0 if unique else 1, name, seq + 1, column))
+        return rows
+
+    def executemany(self, sql, seq_params):
+        seq_params = [tuple(p) for p in seq_params]
+        if not seq_params:
+            return
+        is_insert = sql.lstrip()[:6].upper() == 'INSERT'
+        self._conn.stats.count(sql, 1 if is_insert else len(seq_params))
+        self._rows = None
+        self._cur.executemany(translate(sql), seq_params)
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._rows.pop(0) if self._rows else None
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        return self._cur.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class Connection:
+    """A mysql.connector-like connection over a SQLite database."""
+
+    def __init__(self, path=':memory:', unique_record_id=True, stats=None):
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.executescript(SCHEMA.format(record_id_key='UNIQUE' if unique_record_id else ''))
+        self.stats = stats or Stats()
+        self.db.execute('BEGIN')
+
+    def cursor(self, *args, **kwargs):
+        return Cursor(self)
+
+    def commit(self):
+        self.stats.count('COMMIT')
+        self.db.execute('COMMIT')
+        self.db.execute('BEGIN')
+
+    def rollback(self):
+        self.stats.count('ROLLBACK')
+        self.db.execute('ROLLBACK')
+        self.db.execute('BEGIN')
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.stats.count('PING')
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+    def count_rows(self, table):
+        return self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
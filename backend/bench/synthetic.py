@@ -0,0 +1,88 @@
+"""Synthetic Airtable viaje records shaped like the ones the PWA posts.
+
+Field names and value types follow PendingList.vue's formatFields(); predio,
+chofer, camión, destino, producto and motivo values are drawn from the PWA's
+own public/data catalogs so dimension lookups repeat the way they do in
+production.
+"""
+import json
+import random
+import string
+from datetime import datetime, timedelta
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parents[2] / 'pwa-app' / 'public' / 'data'
+
+
+def _load(name, default):
+    try:
+        with open(DATA_DIR / name, encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return default
+
+
+def load_catalogs():
+    return {
+        'predios': [str(p['id_Predio']) for p in _load('predios.json', [{'id_Predio': 50201}])],
+        'choferes': [c['dni'] for c in _load('choferes.json', [{'dni': '20360944590'}])],
+        'patentes': [c['patente'] for c in _load('camiones.json', [{'patente': 'BZT-336'}])],
+        'destinos': [d['codigo'] for d in _load('destinos.json', [{'codigo': 'PPE'}])],
+        'productos': [p['nombre'] for p in _load('productos.json', [{'nombre': 'Pulpable'}])],
+        'motivos': _load('motivos.json', ['Lluvia']),
+    }
+
+
+def _record_id(rng):
+    return 'rec' + ''.join(rng.choices(string.ascii_letters + string.digits, k=14))
+
+
+def generate_records(count, seed=0, start=datetime(2025, 1, 1), inactive_ratio=0.05):
+    """Yield `count` Airtable-style records ({id, createdTime, fields})."""
+    rng = random.Random(seed)
+    cat = load_catalogs()
+    created = start
+    for _ in range(count):
+        created += timedelta(seconds=rng.randint(1, 90))
+        sin_actividad = rng.random() < inactive_ratio
+        producto = rng.choice(cat['productos'])
+        chips = producto.lower().startswith('chips')
+        fields = {
+            'Fecha': (created.date() - timedelta(days=rng.randint(0, 3))).isoformat(),
+            'Chofer': rng.choice(cat['choferes']),
+            'Patente': rng.choice(cat['patentes']),
+            'Origen': rng.choice(cat['predios']),
+            'Destino': rng.choice(cat['destinos']),
+            'Observaciones': rng.choice(['', '', '', 'Camino en mal estado', 'Demora en balanza']),
+            'Sin_Actividad': sin_actividad,
+            'Motivo_Sin_Actividad': rng.choice(cat['motivos']) if sin_actividad else '',
+            'Producto': '' if sin_actividad else producto,
+            'TNPulpable': 0 if (sin_actividad or chips) else round(rng.uniform(20, 32), 2),
+            'TNAserrable': 0 if (sin_actividad or chips) else round(rng.uniform(0, 10), 2),
+            'TNChips': round(rng.uniform(20, 30), 2) if (chips and not sin_actividad) else 0,
+        }
+        # Airtable omits empty/false fields from the response
+        fields = {k: v for k, v in fields.items() if v not in ('', False, None)}
+        yield {
+            'id': _record_id(rng),
+            'createdTime': created.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'fields': fields,
+        }
+
+
+def write_jsonl(path, count, seed=0):
+    """Write a synthetic snapshot usable with --from-snapshot."""
+    import gzip
+
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as fh:
+        for record in generate_records(count, seed=seed):
+            fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    import sys
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for rec in generate_records(n):
+        print(json.dumps(rec, ensure_ascii=False))
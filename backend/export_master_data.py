@@ -0,0 +1,48 @@
+"""Command line entry point for the PWA master-data export.
+
+Regenerates pwa-app/public/data (predios, choferes, camiones and the
+manifest) from MySQL with airtable_sync.export. Run it after changing the
+dimension tables, or from cron after the sync.
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from airtable_sync import SyncConfig
+from airtable_sync.db import MySQLPool, release
+from airtable_sync.export import export_master_data
+
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pwa-app', 'public', 'data')
+
+
+def parse_args(argv=None):
+    """Parsea los argumentos de la exportación de datos maestros para la PWA.
+
+    Opciones:
+        --out        : Carpeta de salida (por defecto pwa-app/public/data).
+        --empresa-id : Exporta solo choferes y camiones de esta empresa (por defecto MOVILES_EMPRESA_ID).
+    """
+    p = argparse.ArgumentParser(description="Export PWA master data from MySQL")
+    p.add_argument("--out", default=os.getenv('MASTER_DATA_OUT', DEFAULT_OUT_DIR), help="Carpeta de salida de los JSON y el manifest (por defecto pwa-app/public/data).")
+    p.add_argument("--empresa-id", default=None, help="Exporta solo choferes y camiones de esta empresa (por defecto MOVILES_EMPRESA_ID; vacío = todas).")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    config = SyncConfig.from_env(dotenv=False)
+    empresa_id = args.empresa_id if args.empresa_id is not None else config.empresa_id
+    conn = MySQLPool(config, name='master_data_export').connection()
+    cursor = conn.cursor()
+    try:
+        export_master_data(cursor, os.path.normpath(args.out), empresa_id=empresa_id or None,
+                           placeholder_prefix=config.placeholder_prefix)
+    finally:
+        cursor.close()
+        release(conn)
+
+
+if __name__ == "__main__":
+    main()
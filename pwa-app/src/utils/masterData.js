@@ -0,0 +1,68 @@
+// Master data (predios, choferes, camiones, ...) from public/data
+// The backend export (backend/export_master_data.py) writes data/manifest.json with the
+// content-hashed file of each list. The manifest is revalidated on every load (small,
+// no-cache) and a list is downloaded again only when its hash changed; otherwise the copy
+// kept in IndexedDB is used, which also makes the lists available offline.
+// Without a manifest (older deploys) the plain data/<name>.json files are fetched as before.
+import localforage from 'localforage';
+import log from './log';
+
+// separate store: the default localforage store holds the pending viajes
+const store = localforage.createInstance({ name: 'viajesApp', storeName: 'master_data' });
+
+let manifestPromise = null;
+
+function baseUrl() {
+  return import.meta.env.BASE_URL || '/';
+}
+
+function loadManifest() {
+  if (!manifestPromise) {
+    manifestPromise = fetch(`${baseUrl()}data/manifest.json`, { cache: 'no-cache' })
+      .then(res => (res.ok ? res.json() : null))
+      .catch(err => {
+        log.debug('manifest.json no disponible', err);
+        return null;
+      });
+  }
+  return manifestPromise;
+}
+
+async function fetchJson(url) {
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`${url}: HTTP ${res.status}`);
+  return res.json();
+}
+
+export async function loadDataset(name) {
+  const manifest = await loadManifest();
+  const entry = manifest && manifest.files && manifest.files[name];
+  let cached = null;
+  try {
+    cached = await store.getItem(name);
+  } catch (err) {
+    log.warn('No se pudo leer la caché de datos', name, err);
+  }
+
+  if (entry) {
+    if (cached && cached.sha256 === entry.sha256) return cached.data;
+    try {
+      // hashed files never change, so the HTTP cache may keep them forever
+      const data = await fetchJson(`${baseUrl()}data/${entry.file}`);
+      store.setItem(name, { sha256: entry.sha256, data }).catch(err => log.warn('No se pudo guardar la caché de datos', name, err));
+      return data;
+    } catch (err) {
+      log.warn(`No se pudo descargar ${entry.file}`, err);
+    }
+  }
+
+  try {
+    return await fetchJson(`${baseUrl()}data/${name}.json`);
+  } catch (err) {
+    // offline: fall back to the last downloaded copy
+    if (cached) return cached.data;
+    throw err;
+  }
+}
+
+export default { loadDataset };